@@ -0,0 +1,378 @@
+import argparse
+import atexit
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import engine
+from decision_table import rules_fingerprint
+from engine import ACTION_INDEX, ACTION_KEYS, MED_BITS, PATIENT_FLAGS, MedSet, evaluate_facts
+
+# ==========================================
+# JURNAL DE AUDIT BINAR (append-only) + REPLAY
+# ==========================================
+# audit_log.enable("audit/")           # fiecare generate_plan din proces e jurnalizat
+# python audit_log.py replay audit/audit-<amprentă>.pal
+#
+# Fișierul = antet (MAGIC, lungime, JSON: amprenta regulilor, ordinea cheilor de
+# acțiune / medicamentelor / flag-urilor) aliniat la 8 octeți, urmat de înregistrări
+# de lățime fixă (RECORD_SIZE): momentul, cele 4 valori numerice (float64, exact ca
+# la intrare), vârsta (float32, NaN = lipsă), medicația și flag-urile ca bitmask-uri
+# și planul ca bitmask de coduri (planul e mereu în ordinea catalogului, fără
+# repetiții, deci bitmask-ul îl reconstituie exact).
+#
+# Un fișier = o versiune a regulilor (decision_table.rules_fingerprint: faptele,
+# regulile, catalogul de acțiuni, DRUG_CLASSES): după o schimbare de reguli jurnalul
+# existent nu mai primește înregistrări, iar open_log / enable continuă într-un fișier
+# nou (în director: audit-<amprentă>.pal; pentru o cale de fișier: <nume>-<amprentă>.pal).
+# Scrierile sunt bufferizate (se pierd cel mult `buffer_records` înregistrări la o
+# oprire bruscă); o înregistrare scrisă pe jumătate la final e ignorată la citire.
+# Fiecare flush e un singur write() pe un fișier deschis O_APPEND, cu un număr întreg
+# de înregistrări, deci mai multe procese pot scrie în același jurnal (ex. cli.py --workers).
+#
+# Replay: fișierul e mapat în memorie ca tablou NumPy structurat. Faptele se calculează
+# vectorizat (cohort.facts_array, din engine.FACTS), iar motorul live rulează o singură
+# dată per (medicație, fapte) distincte, deci se reevaluează milioane de înregistrări
+# pe secundă cu exact regulile curente.
+
+MAGIC = b"PAL1"
+_RECORD = struct.Struct("<d4dfHBxQ")
+RECORD_SIZE = _RECORD.size
+RECORD_DTYPE = np.dtype([
+    ("time", "<f8"), ("hba1c", "<f8"), ("target", "<f8"), ("egfr", "<f8"), ("bmi", "<f8"),
+    ("age", "<f4"), ("meds", "<u2"), ("flags", "u1"), ("_pad", "u1"), ("actions", "<u8"),
+])
+assert RECORD_DTYPE.itemsize == RECORD_SIZE
+assert len(ACTION_KEYS) <= 64 and len(MED_BITS) <= 16 and len(PATIENT_FLAGS) <= 8
+
+
+def _header():
+    return {
+        "fingerprint": rules_fingerprint(),
+        "action_keys": ACTION_KEYS,
+        "meds": list(MED_BITS),
+        "flags": PATIENT_FLAGS,
+        "record_size": RECORD_SIZE,
+        "created": time.time(),
+    }
+
+
+def _read_header(f, path):
+    head = f.read(8)
+    if len(head) < 8 or head[:4] != MAGIC:
+        raise ValueError(f"{path}: nu este un jurnal de audit")
+    (length,) = struct.unpack_from("<I", head, 4)
+    header = json.loads(f.read(length).decode("utf-8"))
+    if header["record_size"] != RECORD_SIZE:
+        raise ValueError(f"{path}: format de înregistrare necunoscut")
+    return header, (8 + length + 7) // 8 * 8
+
+
+def log_path(directory):
+    """Fișierul jurnalului pentru versiunea curentă a regulilor, într-un director."""
+    return os.path.join(directory, f"audit-{rules_fingerprint()[:12]}.pal")
+
+
+class AuditLog:
+    """Scriitor append-only, thread-safe, cu buffer de `buffer_records` înregistrări."""
+
+    def __init__(self, path, buffer_records=4096, repair=True):
+        self.path = path
+        self.fingerprint = rules_fingerprint()
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "r+b") as f:
+                header, offset = _read_header(f, path)
+                if header["fingerprint"] != self.fingerprint or header["action_keys"] != list(ACTION_KEYS):
+                    raise ValueError(f"{path}: jurnal scris cu altă versiune a regulilor, folosiți un fișier nou")
+                # o înregistrare incompletă (oprire în timpul scrierii) se taie; repair=False
+                # pentru procesele care se alătură unui jurnal în care alții scriu deja
+                size = f.seek(0, os.SEEK_END)
+                if repair and (size - offset) % RECORD_SIZE:
+                    f.truncate(size - (size - offset) % RECORD_SIZE)
+        else:
+            header = json.dumps(_header(), ensure_ascii=False).encode("utf-8")
+            offset = (8 + len(header) + 7) // 8 * 8
+            with open(path, "wb") as f:
+                f.write(MAGIC + struct.pack("<I", len(header)) + header + b"\0" * (offset - 8 - len(header)))
+        self._file = open(path, "ab", buffering=0)
+        self._buffer = bytearray(RECORD_SIZE * max(1, buffer_records))
+        self._used = 0
+        self._lock = threading.Lock()
+        self.records = 0
+        atexit.register(self.close)
+
+    def record(self, meds, hba1c, target, egfr, bmi, ascvd, hf, ckd, age, newly_dx, catabolic, ketosis,
+               acute_illness, suspected_t1d, codes):
+        """Adaugă o evaluare: argumentele generate_plan + codurile planului rezultat."""
+        if not isinstance(meds, int):
+            meds = MedSet.from_names(meds)
+        flags = ((ascvd and 1) | (hf and 2) | (ckd and 4) | (newly_dx and 8) | (catabolic and 16)
+                 | (ketosis and 32) | (acute_illness and 64) | (suspected_t1d and 128))  # ordinea PATIENT_FLAGS
+        actions = 0
+        for code in codes:
+            actions |= 1 << code
+        with self._lock:
+            _RECORD.pack_into(self._buffer, self._used, time.time(), hba1c, target, egfr, bmi,
+                              float("nan") if age is None else age, meds, flags, actions)
+            self._used += RECORD_SIZE
+            self.records += 1
+            if self._used == len(self._buffer):
+                self._write()
+
+    def _write(self):
+        self._file.write(memoryview(self._buffer)[:self._used])
+        self._used = 0
+
+    def flush(self, sync=False):
+        with self._lock:
+            if self._used:
+                self._write()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        if not self._file.closed:
+            self.flush(sync=True)
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ------------------------------
+# activare pentru tot procesul
+# ------------------------------
+_active = None
+
+
+def _log_fingerprint(path):
+    """Amprenta din antetul unui jurnal existent (None dacă fișierul lipsește sau e gol)."""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return None
+    with open(path, "rb") as f:
+        header, _ = _read_header(f, path)
+    return header["fingerprint"]
+
+
+def open_log(path, buffer_records=4096, repair=True):
+    """AuditLog pentru `path`: fișier sau director (atunci un fișier per versiune a regulilor).
+
+    Dacă fișierul dat a fost scris cu altă versiune a regulilor, se continuă în
+    <nume>-<amprentă><extensie>, alături, în loc să se refuze scrierea.
+    """
+    if os.path.isdir(path):
+        path = log_path(path)
+    elif _log_fingerprint(path) not in (None, rules_fingerprint()):
+        root, ext = os.path.splitext(path)
+        path = f"{root}-{rules_fingerprint()[:12]}{ext or '.pal'}"
+    return AuditLog(path, buffer_records, repair)
+
+
+def enable(path, buffer_records=4096, repair=True):
+    """Jurnalizează fiecare generate_plan din proces (vezi open_log pentru `path`)."""
+    global _active
+    disable()
+    _active = open_log(path, buffer_records, repair)
+    engine.set_recorder(_active)
+    return _active
+
+
+def flush():
+    if _active is not None:
+        _active.flush()
+
+
+def disable():
+    global _active
+    engine.set_recorder(None)
+    if _active is not None:
+        _active.close()
+        _active = None
+
+
+# ==========================================
+# CITIRE (mmap) ȘI REPLAY PE REGULILE CURENTE
+# ==========================================
+def _remap(masks, old_names, index):
+    """Bitmask-uri scrise în ordinea old_names -> ordinea `index` (nume -> bit)."""
+    order = [index[name] for name in old_names]
+    if order == list(range(len(order))):
+        return masks
+    out = np.zeros_like(masks)
+    for old, new in enumerate(order):
+        out |= (masks >> old & 1) << new
+    return out
+
+
+class AuditReader:
+    """Jurnalul mapat în memorie; `records` e un tablou NumPy structurat (RECORD_DTYPE), fără copiere."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.header, offset = _read_header(f, path)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        count = (len(self._mm) - offset) // RECORD_SIZE
+        self.records = np.frombuffer(self._mm, dtype=RECORD_DTYPE, count=count, offset=offset)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def stale(self):
+        return self.header["fingerprint"] != rules_fingerprint()
+
+    def columns(self, start=0, stop=None):
+        """(numerics, flags, medicație, plan) pentru înregistrările [start, stop), în ordinea curentă."""
+        recs = self.records[start:stop]
+        numerics = {name: recs[name] for name in ("hba1c", "target", "egfr", "bmi")}
+        flags = {name: (recs["flags"] >> bit & 1).astype(bool) for bit, name in enumerate(self.header["flags"])}
+        missing = set(self.header["meds"]) - set(MED_BITS)
+        if missing:
+            raise ValueError(f"{self.path}: clase de medicamente care nu mai există: {', '.join(sorted(missing))}")
+        meds = _remap(recs["meds"].astype(np.uint64), self.header["meds"], {n: b.bit_length() - 1 for n, b in MED_BITS.items()})
+        return numerics, flags, meds, recs["actions"]
+
+    def patient(self, i):
+        """Înregistrarea i decodificată: argumentele generate_plan + cheile acțiunilor + momentul."""
+        rec = self.records[i]
+        patient = {name: float(rec[name]) for name in ("hba1c", "target", "egfr", "bmi")}
+        patient.update({name: bool(rec["flags"] >> bit & 1) for bit, name in enumerate(self.header["flags"])})
+        patient["age"] = None if np.isnan(rec["age"]) else float(rec["age"])
+        meds = int(rec["meds"])
+        patient["meds"] = [name for bit, name in enumerate(self.header["meds"]) if meds >> bit & 1]
+        actions = int(rec["actions"])
+        return {
+            "time": datetime.fromtimestamp(float(rec["time"]), timezone.utc).isoformat(timespec="milliseconds"),
+            "patient": patient,
+            "plan": [key for bit, key in enumerate(self.header["action_keys"]) if actions >> bit & 1],
+        }
+
+    def close(self):
+        self.records = None
+        self._mm.close()
+
+
+def _bits(masks, count):
+    return [int(np.count_nonzero(masks >> np.uint64(bit) & np.uint64(1))) for bit in range(count)]
+
+
+def replay(reader, chunk_size=1 << 20, examples=10):
+    """Reevaluează jurnalul cu regulile live; raport cu planurile care s-ar schimba.
+
+    Acțiunile sunt comparate după cheie, deci catalogul poate fi reordonat / extins
+    între versiuni; cheile dispărute apar la "removed".
+    """
+    from cohort import facts_array
+
+    start_time = time.perf_counter()
+    keys = list(ACTION_KEYS) + [k for k in reader.header["action_keys"] if k not in ACTION_INDEX]
+    key_index = {key: bit for bit, key in enumerate(keys)}
+    # (medicație << 32 | fapte) distincte, sortate -> bitmask-ul planului curent; crește între blocuri
+    known = np.empty(0, dtype=np.uint64)
+    known_plans = np.empty(0, dtype=np.uint64)
+    changed = 0
+    added = np.zeros(len(keys), dtype=np.int64)
+    removed = np.zeros(len(keys), dtype=np.int64)
+    found = []
+    for start in range(0, len(reader), chunk_size):
+        numerics, flags, meds, actions = reader.columns(start, start + chunk_size)
+        combos = meds << np.uint64(32) | facts_array(numerics, flags).astype(np.uint64)
+        unique, inverse = np.unique(combos, return_inverse=True)
+        pos = np.searchsorted(known, unique)
+        seen = known[np.minimum(pos, len(known) - 1)] == unique if len(known) else np.zeros(len(unique), dtype=bool)
+        new = unique[~seen]
+        new_plans = np.empty(len(new), dtype=np.uint64)
+        for j, combo in enumerate(new.tolist()):
+            codes = []
+            evaluate_facts(combo >> 32, combo & 0xFFFFFFFF, codes)
+            mask = 0
+            for code in codes:
+                mask |= 1 << code
+            new_plans[j] = mask
+        current = np.empty(len(unique), dtype=np.uint64)
+        current[seen] = known_plans[pos[seen]]
+        current[~seen] = new_plans
+        if len(new):
+            known = np.concatenate([known, new])
+            order = np.argsort(known, kind="stable")
+            known, known_plans = known[order], np.concatenate([known_plans, new_plans])[order]
+        after = current[inverse]
+        before = _remap(actions.astype(np.uint64), reader.header["action_keys"], key_index)
+        diff = np.flatnonzero(before != after)
+        if not len(diff):
+            continue
+        changed += len(diff)
+        added += _bits(after[diff] & ~before[diff], len(keys))
+        removed += _bits(before[diff] & ~after[diff], len(keys))
+        for i in diff[:max(examples - len(found), 0)].tolist():
+            example = reader.patient(start + i)
+            example["index"] = start + i
+            example["plan_now"] = [keys[bit] for bit in range(len(keys)) if int(after[i]) >> bit & 1]
+            found.append(example)
+
+    seconds = time.perf_counter() - start_time
+    return {
+        "records": len(reader),
+        "changed": changed,
+        "log_fingerprint": reader.header["fingerprint"],
+        "rules_fingerprint": rules_fingerprint(),
+        "added": {keys[bit]: int(n) for bit, n in enumerate(added) if n},
+        "removed": {keys[bit]: int(n) for bit, n in enumerate(removed) if n},
+        "distinct_inputs": len(known),
+        "seconds": round(seconds, 3),
+        "records_per_s": round(len(reader) / seconds) if seconds else None,
+        "examples": found,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Jurnal de audit al planurilor: inspecție și replay pe regulile curente")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_info = sub.add_parser("info", help="antetul și numărul de înregistrări")
+    p_info.add_argument("path")
+    p_dump = sub.add_parser("dump", help="înregistrările ca JSONL (pacient + plan)")
+    p_dump.add_argument("path")
+    p_dump.add_argument("--start", type=int, default=0)
+    p_dump.add_argument("--limit", type=int, default=None)
+    p_replay = sub.add_parser("replay", help="ce recomandări s-ar schimba cu regulile curente")
+    p_replay.add_argument("path")
+    p_replay.add_argument("--examples", type=int, default=10, help="înregistrări schimbate incluse în raport")
+    p_replay.add_argument("--json", action="store_true", help="raportul complet ca JSON pe stdout")
+    args = parser.parse_args(argv)
+
+    reader = AuditReader(args.path)
+    if args.command == "info":
+        print(json.dumps(dict(reader.header, records=len(reader), stale=reader.stale), indent=2, ensure_ascii=False))
+        return 0
+    if args.command == "dump":
+        stop = len(reader) if args.limit is None else min(len(reader), args.start + args.limit)
+        for i in range(args.start, stop):
+            print(json.dumps(reader.patient(i), ensure_ascii=False))
+        return 0
+
+    report = replay(reader, examples=args.examples)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    same = "aceeași" if not reader.stale else "altă"
+    print(f"{report['records']} înregistrări ({same} versiune a regulilor), {report['changed']} planuri schimbate, "
+          f"{report['seconds']}s ({report['records_per_s'] or 0:,} înregistrări/s)", file=sys.stderr)
+    for key, n in report["added"].items():
+        print(f"  + {key}: {n}", file=sys.stderr)
+    for key, n in report["removed"].items():
+        print(f"  - {key}: {n}", file=sys.stderr)
+    return 1 if report["changed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import argparse
+import subprocess
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from engine import MedSet, generate_plan  # noqa: E402
+from synthetic import synthetic_patients  # noqa: E402
+
+# ==========================================
+# MICROBENCHMARK: set de medicamente listă vs bitmask
+# ==========================================
+# python benchmarks/bench_medset.py --baseline <rev>
+# Timpul per apel al generate_plan pe același set de pacienți: intrare listă,
+# intrare MedSet și, opțional, engine.py dintr-o revizie git anterioară.
+
+
+def load_revision(rev):
+    source = subprocess.run(["git", "show", f"{rev}:engine.py"], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    namespace = {"__name__": f"engine@{rev}"}
+    exec(compile(source, f"engine.py@{rev}", "exec"), namespace)
+    return namespace["generate_plan"]
+
+
+def per_call_us(fn, cases, repeat):
+    def run():
+        for case in cases:
+            fn(**case)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return best / len(cases) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark generate_plan: listă vs bitmask")
+    parser.add_argument("--cases", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", help="revizie git cu engine.py de comparat (ex. implementarea pe liste)")
+    args = parser.parse_args(argv)
+
+    cases = synthetic_patients(args.cases)
+    mask_cases = [dict(c, meds=MedSet.from_names(c["meds"])) for c in cases]
+
+    results = {
+        "generate_plan(meds=list)": per_call_us(generate_plan, cases, args.repeat),
+        "generate_plan(meds=MedSet)": per_call_us(generate_plan, mask_cases, args.repeat),
+    }
+    if args.baseline:
+        results[f"generate_plan@{args.baseline}"] = per_call_us(load_revision(args.baseline), cases, args.repeat)
+
+    reference = results.get(f"generate_plan@{args.baseline}")
+    for name, us in results.items():
+        gain = f"  ({reference / us:.2f}x)" if reference else ""
+        print(f"{name:<40} {us:7.2f} µs/apel{gain}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from run import summarize  # noqa: E402
+from synthetic import synthetic_patients  # noqa: E402
+
+# ==========================================
+# TEST DE ÎNCĂRCARE PENTRU service.py
+# ==========================================
+# python benchmarks/load_test.py --spawn                       # pornește un serviciu local
+# python benchmarks/load_test.py --url http://127.0.0.1:8080 --concurrency 128 --duration 20
+# --concurrency clienți cu conexiuni keep-alive trimit POST /plan în buclă (un pacient
+# sintetic per cerere). Raportează p50/p99 (µs), cereri/s și codurile de răspuns.
+
+
+async def _client(host, port, bodies, offset, stop_at, samples, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = offset
+    try:
+        while time.perf_counter() < stop_at:
+            body = bodies[i % len(bodies)]
+            i += 1
+            request = (
+                f"POST /plan HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            ).encode("latin-1") + body
+            t = time.perf_counter_ns()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            length = next(int(line.split(":", 1)[1]) for line in lines if line.lower().startswith("content-length:"))
+            await reader.readexactly(length)
+            samples.append(time.perf_counter_ns() - t)
+            status = int(lines[0].split(" ")[1])
+            statuses[status] = statuses.get(status, 0) + 1
+            if any(line.lower() == "connection: close" for line in lines):
+                break
+    finally:
+        writer.close()
+
+
+async def load(host, port, concurrency, duration, patients):
+    bodies = [json.dumps(p).encode("utf-8") for p in patients]
+    samples, statuses = [], {}
+    start = time.perf_counter()
+    stop_at = start + duration
+    await asyncio.gather(*(
+        _client(host, port, bodies, i * 97, stop_at, samples, statuses) for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    result = summarize(samples, len(samples), elapsed) if samples else {"ops": 0}
+    result["concurrency"] = concurrency
+    result["statuses"] = {str(k): v for k, v in sorted(statuses.items())}
+    return result
+
+
+def _wait_until_up(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"serviciul nu răspunde pe {host}:{port}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de încărcare pentru service.py (POST /plan)")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--spawn", action="store_true", help="pornește service.py local pe portul din --url")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0, help="secunde")
+    parser.add_argument("--patients", type=int, default=5_000, help="pacienți sintetici distincți trimiși ciclic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="scrie rezultatul JSON în fișier")
+    parser.add_argument("service_args", nargs=argparse.REMAINDER, help="după --: argumente pentru service.py")
+    args = parser.parse_args(argv)
+
+    host, _, port = args.url.split("://", 1)[-1].rstrip("/").partition(":")
+    port = int(port or 80)
+    proc = None
+    if args.spawn:
+        extra = [a for a in args.service_args if a != "--"]
+        proc = subprocess.Popen([sys.executable, str(ROOT / "service.py"), "--host", host, "--port", str(port), *extra])
+    try:
+        _wait_until_up(host, port)
+        patients = synthetic_patients(args.patients, args.seed)
+        result = asyncio.run(load(host, port, args.concurrency, args.duration, patients))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    print(text)
+    print(f"{result.get('ops_per_s', 0):.0f} cereri/s, p50 {result.get('p50_us', 0) / 1e3:.2f} ms, "
+          f"p99 {result.get('p99_us', 0) / 1e3:.2f} ms", file=sys.stderr)
+    return 0 if set(result["statuses"]) <= {"200"} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
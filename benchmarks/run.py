@@ -0,0 +1,278 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from engine import MedSet, generate_plan, plan_codes, plan_key  # noqa: E402
+from synthetic import as_frame, synthetic_patients, synthetic_visits  # noqa: E402
+
+# ==========================================
+# SUITA DE BENCHMARK
+# ==========================================
+# python benchmarks/run.py -o bench.json                  # rulează și salvează
+# python benchmarks/run.py --compare baseline.json        # marchează regresiile
+# Fiecare benchmark raportează throughput (op/s) și latențe p50/p99 (µs) într-un
+# JSON; --compare iese cu cod 1 dacă p50 crește sau throughput-ul scade peste prag.
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def summarize(samples_ns, ops, total_s):
+    samples = sorted(samples_ns)
+    return {
+        "ops": ops,
+        "ops_per_s": ops / total_s if total_s else 0.0,
+        "p50_us": samples[len(samples) // 2] / 1e3,
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1e3,
+        "mean_us": statistics.fmean(samples) / 1e3,
+    }
+
+
+def time_calls(fn, args_list):
+    clock = time.perf_counter_ns
+    samples = []
+    start = clock()
+    for args in args_list:
+        t = clock()
+        fn(**args)
+        samples.append(clock() - t)
+    return summarize(samples, len(args_list), (clock() - start) / 1e9)
+
+
+@benchmark("scalar.generate_plan")
+def bench_scalar(opts):
+    return time_calls(generate_plan, synthetic_patients(opts.patients, opts.seed))
+
+
+@benchmark("scalar.generate_plan[MedSet]")
+def bench_scalar_mask(opts):
+    patients = [dict(p, meds=MedSet.from_names(p["meds"])) for p in synthetic_patients(opts.patients, opts.seed)]
+    return time_calls(generate_plan, patients)
+
+
+@benchmark("scalar.generate_plan[instrumented]")
+def bench_scalar_instrumented(opts):
+    import instrumentation
+
+    instrumentation.enable(trace_size=1000)
+    try:
+        return time_calls(generate_plan, synthetic_patients(opts.patients, opts.seed))
+    finally:
+        instrumentation.disable()
+
+
+@benchmark("scalar.plan_codes")
+def bench_plan_codes(opts):
+    return time_calls(plan_codes, synthetic_patients(opts.patients, opts.seed))
+
+
+@benchmark("scalar.plan_key")
+def bench_plan_key(opts):
+    return time_calls(plan_key, synthetic_patients(opts.patients, opts.seed))
+
+
+@benchmark("lookup.decision_table")
+def bench_table(opts):
+    if not opts.table:
+        return {"skipped": "fără --table (python decision_table.py compile plans.pdt)"}
+    from decision_table import DecisionTable
+
+    table = DecisionTable.load(opts.table)
+    return time_calls(table.plan_id, synthetic_patients(opts.patients, opts.seed))
+
+
+@benchmark("batch.evaluate_cohort")
+def bench_batch(opts):
+    from cohort import evaluate_cohort
+
+    frame = as_frame(synthetic_patients(opts.batch_rows, opts.seed))
+    chunk = opts.batch_chunk
+    chunks = [frame.iloc[i:i + chunk] for i in range(0, len(frame), chunk)]
+    samples = []
+    start = time.perf_counter_ns()
+    for part in chunks:
+        t = time.perf_counter_ns()
+        evaluate_cohort(part)
+        samples.append(time.perf_counter_ns() - t)
+    result = summarize(samples, len(frame), (time.perf_counter_ns() - start) / 1e9)
+    result["unit"] = f"rânduri (latență per bloc de {chunk})"
+    return result
+
+
+@benchmark("batch.simulate")
+def bench_simulate(opts):
+    from simulate import simulate
+
+    frame = as_frame(synthetic_patients(opts.batch_rows, opts.seed))
+    chunk = opts.batch_chunk
+    samples = []
+    start = time.perf_counter_ns()
+    for i in range(0, len(frame), chunk):
+        t = time.perf_counter_ns()
+        simulate(frame.iloc[i:i + chunk], steps=opts.sim_steps, seed=opts.seed, chunk_size=chunk)
+        samples.append(time.perf_counter_ns() - t)
+    result = summarize(samples, len(frame), (time.perf_counter_ns() - start) / 1e9)
+    result["unit"] = f"pacienți x {opts.sim_steps} vizite (latență per bloc de {chunk})"
+    return result
+
+
+@benchmark("scalar.visits_incremental")
+def bench_visits_incremental(opts):
+    from visits import IncrementalPlanner
+
+    visits = synthetic_visits(max(1, opts.patients // opts.visits), opts.visits, opts.seed)
+    result = time_calls(IncrementalPlanner().evaluate, visits)
+    result["unit"] = f"vizite ({opts.visits} per pacient)"
+    return result
+
+
+@benchmark("batch.visits_history")
+def bench_visits_history(opts):
+    from visits import HistoryPlanner
+
+    frame = as_frame(synthetic_visits(max(1, opts.batch_rows // opts.visits), opts.visits, opts.seed))
+    chunk = opts.batch_chunk
+    planner = HistoryPlanner()
+    samples = []
+    start = time.perf_counter_ns()
+    for i in range(0, len(frame), chunk):
+        t = time.perf_counter_ns()
+        planner.update(frame.iloc[i:i + chunk])
+        samples.append(time.perf_counter_ns() - t)
+    result = summarize(samples, len(frame), (time.perf_counter_ns() - start) / 1e9)
+    result["unit"] = f"vizite ({opts.visits} per pacient; latență per bloc de {chunk})"
+    return result
+
+
+@benchmark("render.render_plan")
+def bench_render(opts):
+    from render import render_plan
+
+    plans = [{"codes": plan_codes(**p), "above_target": p["hba1c"] > p["target"]}
+             for p in synthetic_patients(opts.patients, opts.seed)]
+    return time_calls(render_plan, plans)
+
+
+@benchmark("app.rerun")
+def bench_app_rerun(opts):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=60).run()
+    samples = []
+    start = time.perf_counter_ns()
+    for _ in range(opts.reruns):
+        t = time.perf_counter_ns()
+        at.run()
+        samples.append(time.perf_counter_ns() - t)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return summarize(samples, opts.reruns, (time.perf_counter_ns() - start) / 1e9)
+
+
+@benchmark("app.submit")
+def bench_app_submit(opts):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=60).run()
+    checkboxes = [c for c in at.checkbox if c.label in ("Sulfoniluree (SU)", "ASCVD (Infarct, AVC, PAD)")]
+    samples = []
+    start = time.perf_counter_ns()
+    for i in range(opts.reruns):
+        checkboxes[i % len(checkboxes)].set_value(not checkboxes[i % len(checkboxes)].value)
+        submit = [b for b in at.button if b.label == "Generează planul"]
+        if submit:
+            submit[0].click()
+        t = time.perf_counter_ns()
+        at.run()
+        samples.append(time.perf_counter_ns() - t)
+        checkboxes = [c for c in at.checkbox if c.label in ("Sulfoniluree (SU)", "ASCVD (Infarct, AVC, PAD)")]
+    return summarize(samples, opts.reruns, (time.perf_counter_ns() - start) / 1e9)
+
+
+def metadata():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        rev = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(current, baseline, threshold):
+    """Listă de regresii: (nume, metrică, valoare_baseline, valoare_curentă)."""
+    regressions = []
+    for name, now in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or "ops_per_s" not in now or "ops_per_s" not in before:
+            continue
+        if now["p50_us"] > before["p50_us"] * (1 + threshold):
+            regressions.append((name, "p50_us", before["p50_us"], now["p50_us"]))
+        if now["ops_per_s"] < before["ops_per_s"] * (1 - threshold):
+            regressions.append((name, "ops_per_s", before["ops_per_s"], now["ops_per_s"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pentru motorul de decizie și rerun-ul Streamlit")
+    parser.add_argument("-o", "--output", help="scrie rezultatele JSON în fișier (implicit stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON salvat anterior; ieșire 1 la regresii")
+    parser.add_argument("--threshold", type=float, default=0.10, help="toleranță relativă la --compare")
+    parser.add_argument("-k", "--select", action="append", help="rulează doar benchmark-urile care conțin textul")
+    parser.add_argument("--patients", type=int, default=20_000)
+    parser.add_argument("--batch-rows", type=int, default=200_000)
+    parser.add_argument("--batch-chunk", type=int, default=50_000)
+    parser.add_argument("--sim-steps", type=int, default=4)
+    parser.add_argument("--visits", type=int, default=10, help="vizite per pacient, pentru visits_*")
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--table", help="tabel de decizie compilat, pentru lookup.decision_table")
+    opts = parser.parse_args(argv)
+
+    results = {}
+    for name, fn in BENCHMARKS.items():
+        if opts.select and not any(s in name for s in opts.select):
+            continue
+        try:
+            results[name] = fn(opts)
+        except ImportError as exc:
+            results[name] = {"error": f"dependență lipsă: {exc.name}"}
+        print(f"{name:<32} {json.dumps(results[name])}", file=sys.stderr)
+
+    report = {"meta": metadata(), "results": results}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if opts.output:
+        Path(opts.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if opts.compare:
+        baseline = json.loads(Path(opts.compare).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, opts.threshold)
+        for name, metric, before, now in regressions:
+            print(f"REGRESIE {name}.{metric}: {before:.2f} -> {now:.2f}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from engine import DRUG_CLASSES  # noqa: E402
+
+# ==========================================
+# GENERATOR SINTETIC DE PACIENȚI
+# ==========================================
+# Indexul pacientului parcurge sistematic spațiul discret:
+#   i % 512           -> toate cele 2^9 combinații de medicație
+#   (i // 512) % 16   -> toate combinațiile de red flags
+#   (i // 8192) % 16  -> ASCVD / HF / CKD / diagnostic recent
+# deci 131072 pacienți consecutivi acoperă tot spațiul discret. Valorile numerice
+# sunt trase (seed fix) din toate benzile relevante, inclusiv fix pe praguri.
+
+MEDS = tuple(DRUG_CLASSES)
+RED_FLAGS = ("suspected_t1d", "ketosis", "catabolic", "acute_illness")
+ORGAN_FLAGS = ("ascvd", "hf", "ckd", "newly_dx")
+FULL_CYCLE = (1 << len(MEDS)) * (1 << len(RED_FLAGS)) * (1 << len(ORGAN_FLAGS))
+
+EGFR_RANGES = ((5, 19), (20, 29), (30, 44), (45, 140))
+EGFR_EDGES = (15, 19, 20, 29, 30, 44, 45)
+TARGETS = (6.5, 7.0, 7.5, 8.0)
+
+
+def patient(i, rng):
+    red = (i >> 9) & 0xF
+    organ = (i >> 13) & 0xF
+    if rng.random() < 0.2:
+        egfr = rng.choice(EGFR_EDGES)
+    else:
+        egfr = rng.randint(*rng.choice(EGFR_RANGES))
+    p = {
+        "meds": [m for bit, m in enumerate(MEDS) if i >> bit & 1],
+        "hba1c": round(rng.uniform(4.0, 18.0), 1),
+        "target": rng.choice(TARGETS),
+        "egfr": egfr,
+        "bmi": rng.choice((27.0, 30.0)) if rng.random() < 0.1 else round(rng.uniform(16, 55), 1),
+        "age": rng.randint(18, 100),
+    }
+    for bit, name in enumerate(RED_FLAGS):
+        p[name] = bool(red >> bit & 1)
+    for bit, name in enumerate(ORGAN_FLAGS):
+        p[name] = bool(organ >> bit & 1)
+    return p
+
+
+def synthetic_patients(n, seed=0):
+    """n pacienți deterministici (același seed -> aceleași date)."""
+    rng = random.Random(seed)
+    return [patient(i, rng) for i in range(n)]
+
+
+def synthetic_visits(n_patients, visits, seed=0):
+    """Istoric de vizite intercalate (vizita 1 a tuturor, apoi vizita 2, ...), cu "patient_id".
+
+    Pacientul i pornește ca în synthetic_patients; de la o vizită la alta HbA1c și BMI
+    variază ușor, eGFR scade lent, iar rar se adaugă / scoate o clasă sau apare o boală acută.
+    """
+    rng = random.Random(seed)
+    current = [patient(i, rng) for i in range(n_patients)]
+    out = []
+    for _ in range(visits):
+        for i, p in enumerate(current):
+            out.append(dict(p, patient_id=i))
+            p = current[i] = dict(p)
+            p["hba1c"] = round(min(max(p["hba1c"] + rng.gauss(0, 0.3), 4.0), 18.0), 1)
+            p["bmi"] = round(p["bmi"] + rng.gauss(0, 0.2), 1)
+            if rng.random() < 0.3:
+                p["egfr"] = max(p["egfr"] - 1, 5)
+            if rng.random() < 0.1:
+                med = rng.choice(MEDS)
+                p["meds"] = [m for m in MEDS if (m in p["meds"]) != (m == med)]
+            p["acute_illness"] = rng.random() < 0.02
+    return out
+
+
+def as_frame(patients):
+    import pandas as pd
+
+    return pd.DataFrame(patients)
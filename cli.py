@@ -0,0 +1,117 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from engine import generate_plan, parse_patient
+
+# ==========================================
+# CLI BATCH (streaming, fără Streamlit)
+# ==========================================
+# python cli.py pacienti.jsonl -o planuri.jsonl --workers 0
+# Citește JSONL/CSV rând cu rând și scrie câte o linie JSONL per pacient,
+# în ordinea de intrare. Memoria rămâne constantă: în pool sunt cel mult
+# 2 x workers blocuri de --chunk-size rânduri în lucru.
+# --audit-log: fiecare plan generat se adaugă în jurnalul de audit (audit_log.py);
+# workerii scriu direct în același fișier, golind bufferul după fiecare bloc.
+
+
+def evaluate_record(item):
+    """(nr_linie, rând brut) -> (ok, linie JSON de ieșire)."""
+    line_no, raw = item
+    try:
+        record = json.loads(raw) if isinstance(raw, str) else raw
+        plan = generate_plan(**parse_patient(record))
+    except ValueError as exc:
+        return False, json.dumps({"line": line_no, "error": str(exc)}, ensure_ascii=False)
+    out = {"id": record["id"], "plan": plan} if "id" in record else {"plan": plan}
+    return True, json.dumps(out, ensure_ascii=False)
+
+
+def _evaluate_chunk(items):
+    out = [evaluate_record(item) for item in items]
+    if _audit is not None:
+        _audit.flush()
+    return out
+
+
+_audit = None
+
+
+def _start_audit(path, repair=True):
+    """Activează jurnalul de audit în procesul curent (și ca initializer în workeri)."""
+    global _audit
+    import audit_log
+
+    _audit = audit_log.enable(path, repair=repair)
+
+
+def read_records(stream, fmt):
+    if fmt == "csv":
+        # header-ul e linia 1
+        for line_no, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_no, row
+    else:
+        for line_no, line in enumerate(stream, start=1):
+            if line.strip():
+                yield line_no, line
+
+
+def run(items, workers=1, chunk_size=256, audit_log=None):
+    items = iter(items)
+    if audit_log:
+        _start_audit(audit_log)  # creează / repară jurnalul înainte să pornească workerii
+    if workers <= 1:
+        for item in items:
+            yield evaluate_record(item)
+        return
+
+    init = (_start_audit, (_audit.path, False)) if audit_log else (None, ())
+    with ProcessPoolExecutor(max_workers=workers, initializer=init[0], initargs=init[1]) as pool:
+        pending = deque()
+        for chunk in iter(lambda: list(islice(items, chunk_size)), []):
+            pending.append(pool.submit(_evaluate_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ADA/EASD 2022 - generare planuri în batch (JSONL/CSV -> JSONL)")
+    parser.add_argument("input", nargs="?", default="-", help="fișier JSONL/CSV sau '-' pentru stdin")
+    parser.add_argument("-o", "--output", default="-", help="fișier JSONL de ieșire sau '-' pentru stdout")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="formatul intrării (implicit după extensie)")
+    parser.add_argument("--workers", type=int, default=1, help="procese paralele (0 = toate nucleele)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="rânduri per bloc trimis unui worker")
+    parser.add_argument("--audit-log", help="jurnal de audit (fișier sau director, vezi audit_log.py)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    workers = args.workers or os.cpu_count() or 1
+
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    errors = 0
+    try:
+        for ok, line in run(read_records(src, fmt), workers, max(1, args.chunk_size), args.audit_log):
+            errors += not ok
+            dst.write(line + "\n")
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+
+    if errors:
+        print(f"{errors} rânduri invalide (vezi câmpul 'error' din ieșire)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+import ast
+import os
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from engine import (
+    ACTION_KEYS, ACTION_TYPES, DEFAULT_LANGUAGE, DRUG_CLASSES, FACT_BITS, FACTS, MED_BITS, PATIENT_FLAGS,
+    PATIENT_NUMERICS, RULES, _as_flag, expand_plan,
+)
+
+# ==========================================
+# MOTOR VECTORIZAT PENTRU COHORTE
+# ==========================================
+# Aceleași reguli ca engine.generate_plan (engine.RULES + engine.FACTS), dar evaluate
+# pe coloane întregi (măști booleene NumPy). O acțiune apare cel mult o dată per
+# plan, în ordinea din engine.ACTION_KEYS, deci planul unui pacient = lista
+# acțiunilor "aprinse".
+
+MEDS = tuple(DRUG_CLASSES)
+RED_FLAG_FIELDS = ("suspected_t1d", "ketosis", "catabolic", "acute_illness")
+
+
+def _med_labels(df):
+    """(rând, indice în MEDS) pentru fiecare nume din coloana "meds"; nume necunoscut = -1."""
+    lists = df["meds"].tolist()
+    rows = np.repeat(np.arange(len(lists)), [len(x) for x in lists])
+    index = {m: j for j, m in enumerate(MEDS)}
+    labels = np.fromiter((index.get(name, -1) for name in chain.from_iterable(lists)), dtype=np.int8, count=len(rows))
+    return rows, labels
+
+
+def unknown_meds(df):
+    """Masca rândurilor cu clase de medicație necunoscute în "meds" (respinse și de engine.parse_patient)."""
+    mask = np.zeros(len(df), dtype=bool)
+    if "meds" in df.columns:
+        rows, labels = _med_labels(df)
+        mask[rows[labels < 0]] = True
+    return mask
+
+
+def _med_columns(df):
+    n = len(df)
+    if "meds" in df.columns:
+        rows, labels = _med_labels(df)
+        columns = {}
+        for j, m in enumerate(MEDS):
+            columns[m] = np.zeros(n, dtype=bool)
+            columns[m][rows[labels == j]] = True
+        return columns
+    return {
+        m: df[m].to_numpy(dtype=bool, copy=True) if m in df.columns else np.zeros(n, dtype=bool)
+        for m in MEDS
+    }
+
+
+def evaluate_cohort(df):
+    """Matrice booleană pacienți x acțiuni (coloane = ACTION_KEYS, în ordinea din plan).
+
+    Medicația se dă fie ca o coloană "meds" (listă de chei DRUG_CLASSES), fie ca
+    câte o coloană booleană per clasă (coloanele lipsă = False).
+    """
+    missing = [c for c in PATIENT_NUMERICS + PATIENT_FLAGS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Coloane lipsă: {', '.join(missing)}")
+
+    numerics = {c: df[c].to_numpy(dtype=float) for c in PATIENT_NUMERICS}
+    flags = {c: df[c].to_numpy(dtype=bool) for c in PATIENT_FLAGS}
+    hits = evaluate_arrays(numerics, flags, _med_columns(df))
+    return pd.DataFrame(hits, index=df.index, columns=list(ACTION_KEYS))
+
+
+def _med_names(mask):
+    return tuple(name for name in MEDS if mask & MED_BITS[name])
+
+
+class _VectorRule:
+    """engine.Rule cu gărzile de medicație ca nume de coloane (vezi evaluate_arrays)."""
+
+    __slots__ = ("code", "when", "unless", "has", "has_any", "lacks", "start", "stop", "then")
+
+    def __init__(self, rule):
+        self.code = rule.code
+        self.when = np.uint32(rule.when)
+        self.unless = np.uint32(rule.unless)
+        self.has = _med_names(rule.has)
+        self.has_any = _med_names(rule.has_any)
+        self.lacks = _med_names(rule.lacks)
+        self.start = _med_names(rule.start)
+        self.stop = _med_names(rule.stop)
+        self.then = tuple(_VectorRule(sub) for sub in rule.then)
+
+
+_VECTOR_RULES = tuple(_VectorRule(rule) for rule in RULES)
+
+
+def _apply_arrays(rules, active, facts, m, hits):
+    # engine._apply pe coloane: `active` = rândurile pe care se evaluează regulile
+    for rule in rules:
+        fired = active & (facts & rule.when == rule.when) if rule.when else active.copy()
+        if rule.unless:
+            fired &= facts & rule.unless == 0
+        for name in rule.has:
+            fired &= m[name]
+        for name in rule.lacks:
+            fired &= ~m[name]
+        if rule.has_any:
+            fired &= np.logical_or.reduce([m[name] for name in rule.has_any])
+        if not fired.any():
+            continue
+        if rule.code is not None:
+            hits[:, rule.code] |= fired
+        for name in rule.stop:
+            m[name] &= ~fired
+        for name in rule.start:
+            m[name] |= fired
+        if rule.then:
+            _apply_arrays(rule.then, fired, facts, m, hits)
+
+
+def evaluate_arrays(numerics, flags, m):
+    """Nucleul lui evaluate_cohort, direct pe tablouri NumPy.
+
+    numerics / flags: {PATIENT_NUMERICS / PATIENT_FLAGS: tablou}; m: {clasă: tablou bool}.
+    Întoarce matricea de acțiuni; `m` este modificat pe loc și devine medicația de
+    după aplicarea planului (echivalentul simulated_meds din generate_plan).
+    Regulile sunt exact engine.RULES, pe faptele din facts_array.
+    """
+    facts = facts_array(numerics, flags)
+    n = len(facts)
+    hits = np.zeros((n, len(ACTION_KEYS)), dtype=bool)
+    _apply_arrays(_VECTOR_RULES, np.ones(n, dtype=bool), facts, m, hits)
+    return hits
+
+
+# ==========================================
+# FAPTELE MOTORULUI, VECTORIZAT
+# ==========================================
+# Expresiile din engine.FACTS (and / or / not pe comparații) rescrise ca operații
+# NumPy pe elemente (& / | / ~). Faptele sunt deci exact cele ale motorului live;
+# împreună cu medicația ele determină complet planul (vezi engine.plan_key).
+class _Vectorize(ast.NodeTransformer):
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        expr = node.values[0]
+        for value in node.values[1:]:
+            expr = ast.BinOp(left=expr, op=op, right=value)
+        return expr
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=node.operand)
+        return node
+
+
+def _compile_vector_facts():
+    compiled = []
+    for name, expr in FACTS.items():
+        tree = ast.fix_missing_locations(_Vectorize().visit(ast.parse(expr, mode="eval")))
+        compiled.append((FACT_BITS[name], compile(tree, f"<FACTS[{name}]>", "eval")))
+    return compiled
+
+
+_VECTOR_FACTS = _compile_vector_facts()
+
+
+def facts_array(numerics, flags):
+    """Bitmask-ul de fapte (engine.patient_facts) pentru fiecare rând, ca tablou uint32."""
+    columns = dict(numerics, **flags)
+    n = len(next(iter(columns.values())))
+    out = np.zeros(n, dtype=np.uint32)
+    for bit, code in _VECTOR_FACTS:
+        out |= np.where(eval(code, {}, columns), np.uint32(bit), np.uint32(0))  # noqa: S307 - expresii din engine.FACTS
+    return out
+
+
+def plan_code_arrays(hits):
+    """Planurile ca tablouri compacte de coduri de acțiune (format CSR).
+
+    Întoarce (codes, offsets): planul pacientului i = codes[offsets[i]:offsets[i + 1]]
+    (uint8, indecși în engine.ACTION_KEYS, în ordinea din plan).
+    """
+    matrix = hits.to_numpy(dtype=bool) if isinstance(hits, pd.DataFrame) else np.asarray(hits, dtype=bool)
+    rows, cols = np.nonzero(matrix)  # row-major: acțiunile fiecărui rând ies deja în ordinea planului
+    offsets = np.searchsorted(rows, np.arange(matrix.shape[0] + 1))
+    return cols.astype(np.uint8), offsets
+
+
+def expand_plans(hits, lang=DEFAULT_LANGUAGE):
+    """Transformă matricea din evaluate_cohort în planuri (liste de dict-uri ca în generate_plan)."""
+    codes, offsets = plan_code_arrays(hits)
+    codes, offsets = codes.tolist(), offsets.tolist()
+    return [expand_plan(codes[offsets[i]:offsets[i + 1]], lang) for i in range(len(offsets) - 1)]
+
+
+def generate_plan_batch(df):
+    """Planul fiecărui pacient din df, ca Series de liste (același index ca df)."""
+    return pd.Series(expand_plans(evaluate_cohort(df)), index=df.index, name="plan")
+
+
+# ==========================================
+# CITIRE PE BLOCURI + AGREGATE INCREMENTALE
+# ==========================================
+# Pentru fișiere mari (CSV / Parquet): cohorta nu se ține niciodată întreagă în
+# memorie; fiecare bloc e normalizat, evaluat și redus la contoare.
+
+
+def _med_list(value):
+    if isinstance(value, str):
+        return [x.strip() for x in value.replace(",", ";").split(";") if x.strip()]
+    return [] if value is None or value != value else list(value)  # NaN = celulă CSV goală
+
+
+def normalize_chunk(frame):
+    """Aduce un bloc citit din fișier la formatul din evaluate_cohort.
+
+    meds ca text "a;b" -> listă; flag-uri text ("da", "true", "0"...) -> bool, lipsă = False;
+    valori numerice invalide -> NaN. Ridică ValueError pentru coloane numerice lipsă
+    sau flag-uri nerecunoscute.
+    """
+    missing = [c for c in PATIENT_NUMERICS if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Coloane lipsă: {', '.join(missing)}")
+    frame = frame.copy()
+    if "meds" in frame.columns:
+        frame["meds"] = frame["meds"].map(_med_list)
+    for name in PATIENT_NUMERICS:
+        frame[name] = pd.to_numeric(frame[name], errors="coerce")
+    for name in PATIENT_FLAGS + MEDS:
+        if name not in frame.columns:
+            if name in PATIENT_FLAGS:
+                frame[name] = False
+            continue
+        column = frame[name]
+        if column.dtype != bool:
+            column = column.astype(object).where(column.notna(), "")
+            frame[name] = column.map({v: _as_flag(name, v) for v in pd.unique(column)}).astype(bool)
+    return frame
+
+
+def read_chunks(source, chunk_size=50_000, fmt=None):
+    """Citește o cohortă CSV / Parquet bloc cu bloc; produce (bloc normalizat, progres 0..1).
+
+    source: cale pe disc sau fișier binar deschis (ex. UploadedFile din Streamlit).
+    fmt: "csv" / "parquet" (implicit după extensie).
+    """
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    fmt = fmt or ("parquet" if str(name).lower().endswith(".parquet") else "csv")
+    handle = open(source, "rb") if isinstance(source, str) else source
+    try:
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            parquet = pq.ParquetFile(handle)
+            total, done = parquet.metadata.num_rows or 1, 0
+            for batch in parquet.iter_batches(batch_size=chunk_size):
+                done += batch.num_rows
+                yield normalize_chunk(batch.to_pandas()), done / total
+        else:
+            handle.seek(0, os.SEEK_END)
+            size = handle.tell() or 1
+            handle.seek(0)
+            for frame in pd.read_csv(handle, chunksize=chunk_size):
+                yield normalize_chunk(frame), min(handle.tell() / size, 1.0)
+    finally:
+        if handle is not source:
+            handle.close()
+
+
+_STOP_CODES = np.array([i for i, (_, kind) in enumerate(ACTION_TYPES) if kind == "STOP"])
+
+
+class CohortAggregate:
+    """Contoare cumulative pe cohortă, actualizate bloc cu bloc (memorie constantă)."""
+
+    def __init__(self):
+        self.patients = 0
+        self.invalid = 0
+        self.actions = np.zeros(len(ACTION_KEYS), dtype=np.int64)
+        self.starts = np.zeros(len(MEDS), dtype=np.int64)
+        self.red_flags = 0
+        self.with_stop = 0
+
+    def update(self, frame):
+        """Evaluează un bloc normalizat (vezi normalize_chunk).
+
+        Rândurile cu valori numerice lipsă sau cu medicație necunoscută sunt sărite (numărate în invalid).
+        """
+        valid = frame[list(PATIENT_NUMERICS)].notna().all(axis=1).to_numpy() & ~unknown_meds(frame)
+        self.invalid += int((~valid).sum())
+        frame = frame[valid]
+        numerics = {c: frame[c].to_numpy(dtype=float) for c in PATIENT_NUMERICS}
+        flags = {c: frame[c].to_numpy(dtype=bool) for c in PATIENT_FLAGS}
+        m = _med_columns(frame)
+        before = np.column_stack([m[name].copy() for name in MEDS])
+        hits = evaluate_arrays(numerics, flags, m)  # m devine medicația de după plan
+        after = np.column_stack([m[name] for name in MEDS])
+
+        self.patients += len(frame)
+        self.actions += hits.sum(axis=0)
+        self.starts += (after & ~before).sum(axis=0)
+        self.red_flags += int(np.logical_or.reduce([flags[c] for c in RED_FLAG_FIELDS]).sum())
+        self.with_stop += int(hits[:, _STOP_CODES].any(axis=1).sum())
+        return self
+
+    def action_types(self):
+        """{type: număr de acțiuni emise} (STOP / START / SWITCH / ALERT)."""
+        counts = {}
+        for (_, kind), n in zip(ACTION_TYPES, self.actions.tolist()):
+            counts[kind] = counts.get(kind, 0) + n
+        return counts
+
+    def start_counts(self):
+        """{clasă: pacienți la care planul o inițiază}."""
+        return dict(zip(MEDS, self.starts.tolist()))
+
+    def shares(self):
+        """Procentul de pacienți cu red flags / cu cel puțin o acțiune STOP."""
+        n = max(self.patients, 1)
+        return {"red_flags": 100 * self.red_flags / n, "stop": 100 * self.with_stop / n}
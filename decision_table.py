@@ -0,0 +1,317 @@
+import argparse
+import hashlib
+import math
+import json
+import mmap
+import random
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+import engine
+from engine import ACTION_KEYS, DRUG_CLASSES, MED_BITS, PATIENT_FLAGS, MedSet, expand_plan, generate_plan
+from whatif import DOMAINS, thresholds
+
+# ==========================================
+# TABEL DE DECIZIE PRECOMPILAT
+# ==========================================
+# În afară de câteva praguri numerice, tot ce citește generate_plan e discret
+# (9 medicamente, 8 flag-uri). Enumerăm o singură dată spațiul "pe benzi" și
+# păstrăm pentru fiecare combinație ID-ul planului (uint16) într-un tablou plat,
+# care poate fi mapat direct din fișier (mmap). O căutare = câteva operații pe întregi.
+# Planurile distincte sunt salvate ca liste de coduri de acțiune; textele se
+# rezolvă la lookup din catalogul de mesaje (deci nu necesită recompilare).
+#
+# Benzile nu sunt fixe: pragurile se extrag din engine.FACTS (whatif.thresholds), deci
+# după o editare de prag în DRUG_CLASSES o recompilare folosește benzile noi. Pentru
+# fiecare variabilă: banda = câte praguri sunt depășite (x >= c dacă pragul aparține
+# intervalului de sus, altfel x > c); reprezentantul benzii = pragul însuși sau
+# mijlocul intervalului. gap = HbA1c - țintă.
+# python decision_table.py compile plans.pdt && python decision_table.py check plans.pdt
+
+MEDS = tuple(DRUG_CLASSES)
+BAND_VARS = ("egfr", "bmi", "gap", "hba1c")
+_JITTER_DOMAINS = dict(DOMAINS, gap=(-3.0, 5.0))
+
+
+def _band_cuts():
+    # pentru aceeași valoare, pragul închis sus (x >= c) e granița de jos
+    found = thresholds()
+    return {var: tuple(sorted(found.get(var, ()), key=lambda cut: (cut[0], not cut[1]))) for var in BAND_VARS}
+
+
+def _representatives(cuts):
+    if not cuts:
+        return (0.0,)
+    reps = [cuts[0][0] - 1]
+    for i, (value, upper) in enumerate(cuts):
+        following = cuts[i + 1][0] if i + 1 < len(cuts) else value + 2
+        reps.append(value if upper else (value + following) / 2)
+    return tuple(reps)
+
+
+BAND_CUTS = _band_cuts()
+BAND_REPS = {var: _representatives(cuts) for var, cuts in BAND_CUTS.items()}
+# band(x) = bisect_right(praguri închise sus, x) + bisect_left(praguri deschise, x)
+_SEARCH = tuple(
+    (tuple(v for v, upper in BAND_CUTS[var] if upper), tuple(v for v, upper in BAND_CUTS[var] if not upper))
+    for var in BAND_VARS
+)
+(_EGFR_CLOSED, _EGFR_OPEN), (_BMI_CLOSED, _BMI_OPEN), (_GAP_CLOSED, _GAP_OPEN), (_A1C_CLOSED, _A1C_OPEN) = _SEARCH
+EGFR_REPS, BMI_REPS, GAP_REPS, HBA1C_REPS = (BAND_REPS[var] for var in BAND_VARS)
+
+SHAPE = (1 << len(MEDS), 1 << len(PATIENT_FLAGS), len(EGFR_REPS), len(BMI_REPS), len(GAP_REPS), len(HBA1C_REPS))
+_STRIDES = [1]
+for _dim in reversed(SHAPE[1:]):
+    _STRIDES.insert(0, _STRIDES[0] * _dim)
+_STRIDES = tuple(_STRIDES)
+SIZE = _STRIDES[0] * SHAPE[0]
+
+MAGIC = b"PDT1"
+
+
+def _rule_fields(rule):
+    return [rule.key, rule.step, rule.when, rule.unless, rule.has, rule.has_any, rule.lacks, rule.start, rule.stop,
+            [_rule_fields(sub) for sub in rule.then]]
+
+
+def rules_fingerprint():
+    """Amprenta semantică a regulilor live: FACTS, RULES, catalogul de acțiuni și DRUG_CLASSES.
+
+    Editările din engine.py care nu schimbă aceste tabele (comentarii, texte,
+    refactorizări) nu schimbă amprenta.
+    """
+    state = {
+        "facts": engine.FACTS,
+        "rules": [_rule_fields(rule) for rule in engine.RULES],
+        "action_keys": ACTION_KEYS,
+        "meds": list(MED_BITS),
+        "drug_classes": DRUG_CLASSES,
+    }
+    return hashlib.sha256(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _band(var, x):
+    closed, open_ = _SEARCH[BAND_VARS.index(var)]
+    return bisect_right(closed, x) + bisect_left(open_, x)
+
+
+def band_index(meds, hba1c, target, egfr, bmi, ascvd, hf, ckd, newly_dx, catabolic, ketosis,
+               acute_illness, suspected_t1d, age=None):
+    med_mask = meds if isinstance(meds, int) else MedSet.from_names(meds)
+    flags = (
+        bool(ascvd) | bool(hf) << 1 | bool(ckd) << 2 | bool(newly_dx) << 3 | bool(catabolic) << 4
+        | bool(ketosis) << 5 | bool(acute_illness) << 6 | bool(suspected_t1d) << 7
+    )
+    s = _STRIDES
+    gap = hba1c - target
+    return (
+        med_mask * s[0] + flags * s[1]
+        + (bisect_right(_EGFR_CLOSED, egfr) + bisect_left(_EGFR_OPEN, egfr)) * s[2]
+        + (bisect_right(_BMI_CLOSED, bmi) + bisect_left(_BMI_OPEN, bmi)) * s[3]
+        + (bisect_right(_GAP_CLOSED, gap) + bisect_left(_GAP_OPEN, gap)) * s[4]
+        + (bisect_right(_A1C_CLOSED, hba1c) + bisect_left(_A1C_OPEN, hba1c)) * s[5]
+    )
+
+
+def representative(index):
+    """Un pacient concret din banda `index` (folosit la compilare și verificare)."""
+    parts = []
+    for stride, dim in zip(_STRIDES, SHAPE):
+        parts.append(index // stride % dim)
+    med_mask, flags, egfr_b, bmi_b, gap_b, a1c_b = parts
+    hba1c = HBA1C_REPS[a1c_b]
+    patient = {
+        "meds": [m for m in MEDS if med_mask & MED_BITS[m]],
+        "hba1c": hba1c,
+        "target": hba1c - GAP_REPS[gap_b],
+        "egfr": EGFR_REPS[egfr_b],
+        "bmi": BMI_REPS[bmi_b],
+        "age": None,
+    }
+    for bit, name in enumerate(PATIENT_FLAGS):
+        patient[name] = bool(flags >> bit & 1)
+    return patient
+
+
+class DecisionTable:
+    def __init__(self, header, ids):
+        self.header = header
+        self.ids = ids
+        self.plans = [tuple(plan) for plan in header["plans"]]
+
+    @property
+    def stale(self):
+        return self.header["fingerprint"] != rules_fingerprint()
+
+    def plan_id(self, **patient):
+        return self.ids[band_index(**patient)]
+
+    def plan_codes(self, **patient):
+        """Codurile acțiunilor din plan (ca engine.plan_codes), prin lookup."""
+        return self.plans[self.ids[band_index(**patient)]]
+
+    def generate_plan(self, meds, hba1c, target, egfr, bmi, ascvd, hf, ckd, age, newly_dx, catabolic,
+                      ketosis, acute_illness, suspected_t1d):
+        """Același rezultat ca engine.generate_plan, prin lookup."""
+        idx = band_index(meds, hba1c, target, egfr, bmi, ascvd, hf, ckd, newly_dx, catabolic, ketosis,
+                         acute_illness, suspected_t1d)
+        return expand_plan(self.plans[self.ids[idx]])
+
+    # ------------------------------
+    # compilare / persistență
+    # ------------------------------
+    @classmethod
+    def compile(cls):
+        """Enumeră tot spațiul pe benzi cu motorul vectorizat (cohort), bloc cu bloc."""
+        other = set(thresholds()) - set(BAND_VARS)
+        if other:
+            raise ValueError(f"engine.FACTS compară și {', '.join(sorted(other))}; benzile acoperă doar {', '.join(BAND_VARS)}")
+        import numpy as np
+        import pandas as pd
+
+        from cohort import evaluate_cohort
+
+        block = _STRIDES[0]
+        sub = np.unravel_index(np.arange(block), SHAPE[1:])
+        flags, egfr_b, bmi_b, gap_b, a1c_b = sub
+        hba1c = np.asarray(HBA1C_REPS)[a1c_b]
+        base = {
+            "hba1c": hba1c,
+            "target": hba1c - np.asarray(GAP_REPS)[gap_b],
+            "egfr": np.asarray(EGFR_REPS, dtype=float)[egfr_b],
+            "bmi": np.asarray(BMI_REPS)[bmi_b],
+        }
+        for bit, name in enumerate(PATIENT_FLAGS):
+            base[name] = (flags >> bit & 1).astype(bool)
+
+        weights = np.left_shift(np.int64(1), np.arange(len(ACTION_KEYS), dtype=np.int64))
+        codes = {}
+        ids = np.empty(SIZE, dtype=np.uint16)
+        for med_mask in range(SHAPE[0]):
+            frame = pd.DataFrame(base)
+            for m in MEDS:
+                frame[m] = bool(med_mask & MED_BITS[m])
+            packed = evaluate_cohort(frame).to_numpy() @ weights
+            uniq, inverse = np.unique(packed, return_inverse=True)
+            local = np.fromiter((codes.setdefault(int(c), len(codes)) for c in uniq), dtype=np.uint16, count=len(uniq))
+            ids[med_mask * block:(med_mask + 1) * block] = local[inverse]
+        if len(codes) > 0xFFFF:
+            raise OverflowError("Prea multe planuri distincte pentru uint16")
+
+        plans = [[i for i in range(len(ACTION_KEYS)) if code >> i & 1] for code in codes]
+        header = {
+            "fingerprint": rules_fingerprint(),
+            "shape": SHAPE,
+            "action_keys": ACTION_KEYS,
+            "plans": plans,
+        }
+        return cls(header, array("H", ids.tobytes()))
+
+    def save(self, path):
+        header = json.dumps(self.header, ensure_ascii=False).encode("utf-8")
+        offset = (len(MAGIC) + 4 + len(header) + 7) // 8 * 8
+        ids = array("H", self.ids)
+        if sys.byteorder != "little":
+            ids.byteswap()
+        with open(path, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(header)) + header)
+            f.write(b"\0" * (offset - f.tell()))
+            ids.tofile(f)
+
+    @classmethod
+    def load(cls, path, check=True):
+        """Mapează tabelul din fișier. Cu check=True refuză un tabel compilat pe alte reguli."""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:4] != MAGIC:
+            raise ValueError(f"{path}: nu este un tabel de decizie")
+        (length,) = struct.unpack_from("<I", mm, 4)
+        header = json.loads(mm[8:8 + length].decode("utf-8"))
+        if tuple(header["shape"]) != SHAPE:
+            raise ValueError(f"{path}: benzi diferite de cele curente, recompilați")
+        if check and header["fingerprint"] != rules_fingerprint():
+            raise ValueError(f"{path}: compilat pentru altă versiune a regulilor, recompilați")
+        offset = (8 + length + 7) // 8 * 8
+        if sys.byteorder != "little":
+            ids = array("H", mm[offset:])
+            ids.byteswap()
+        else:
+            ids = memoryview(mm)[offset:offset + 2 * SIZE].cast("H")
+        return cls(header, ids)
+
+    # ------------------------------
+    # consistență cu regulile live
+    # ------------------------------
+    def verify(self, samples=200_000, seed=0, full=False):
+        """Compară tabelul cu engine.generate_plan. Întoarce lista de indecși nepotriviți.
+
+        Se verifică atât reprezentanții benzilor cât și valori aleatoare din interiorul
+        lor (deci și corectitudinea benzilor). full=True parcurge tot spațiul.
+        """
+        rng = random.Random(seed)
+        indices = range(SIZE) if full else (rng.randrange(SIZE) for _ in range(samples))
+        mismatches = []
+        for idx in indices:
+            patient = representative(idx)
+            if not full:
+                _jitter(patient, rng)
+            if self.generate_plan(**patient) != generate_plan(**patient):
+                mismatches.append(idx)
+        return mismatches
+
+
+def _in_band(var, band, rng):
+    """O valoare aleatoare din interiorul benzii (reprezentantul dacă intervalul e degenerat)."""
+    cuts = BAND_CUTS[var]
+    lo = cuts[band - 1][0] if band else _JITTER_DOMAINS[var][0]
+    hi = cuts[band][0] if band < len(cuts) else _JITTER_DOMAINS[var][1]
+    value = rng.randint(math.ceil(lo), math.floor(hi)) if var == "egfr" and hi - lo >= 1 else rng.uniform(lo, hi)
+    if var != "egfr":
+        value = round(value, 2)
+    return value if _band(var, value) == band else BAND_REPS[var][band]
+
+
+def _jitter(patient, rng):
+    bands = {var: _band(var, patient[var]) for var in ("egfr", "bmi", "hba1c")}
+    gap_band = _band("gap", patient["hba1c"] - patient["target"])
+    patient["egfr"] = _in_band("egfr", bands["egfr"], rng)
+    patient["bmi"] = _in_band("bmi", bands["bmi"], rng)
+    hba1c = _in_band("hba1c", bands["hba1c"], rng)
+    patient["hba1c"], patient["target"] = hba1c, hba1c - _in_band("gap", gap_band, rng)
+    if _band("gap", patient["hba1c"] - patient["target"]) != gap_band:  # rotunjire float la margine
+        patient["target"] = hba1c - GAP_REPS[gap_band]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tabel de decizie precompilat pentru generate_plan")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_compile = sub.add_parser("compile", help="enumeră spațiul pe benzi și scrie tabelul")
+    p_compile.add_argument("path")
+    p_check = sub.add_parser("check", help="verifică tabelul față de regulile live")
+    p_check.add_argument("path")
+    p_check.add_argument("--samples", type=int, default=200_000)
+    p_check.add_argument("--full", action="store_true", help="verificare exhaustivă (lentă)")
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        table = DecisionTable.compile()
+        table.save(args.path)
+        print(f"{args.path}: {SIZE} intrări, {len(table.plans)} planuri distincte")
+        return 0
+
+    table = DecisionTable.load(args.path, check=False)
+    if table.stale:
+        print(f"{args.path}: amprenta regulilor s-a schimbat (reguli / praguri modificate), recompilați", file=sys.stderr)
+        return 1
+    mismatches = table.verify(samples=args.samples, full=args.full)
+    if mismatches:
+        print(f"{len(mismatches)} nepotriviri, ex.: {representative(mismatches[0])}", file=sys.stderr)
+        return 1
+    print(f"{args.path}: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,526 @@
+import math
+from functools import lru_cache
+
+from messages import DEFAULT_LANGUAGE, MESSAGES
+
+# ==========================================
+# MOTOR HEADLESS (fără Streamlit)
+# ==========================================
+# Logica de decizie ADA/EASD, importabilă din workeri, CLI sau teste.
+# Nu importă nimic greu: doar biblioteca standard.
+
+# ==========================================
+# CLASE DE DEFINIȚIE (BAZA DE CUNOȘTINȚE)
+# ==========================================
+# Definiții bazate pe textul furnizat (Table 1 & Text)
+# hba1c_effect = (medie, deviație standard) a scăderii HbA1c (%) la adăugarea clasei,
+# după eficacitatea glicemică din Table 1 (folosit doar de simulate.py)
+DRUG_CLASSES = {
+    "Metformin": {"type": "Oral", "contra_egfr": 30, "warning_egfr": 45, "hba1c_effect": (1.1, 0.4)},
+    "SGLT2i": {"type": "Oral", "contra_egfr": 20, "benefit": ["HF", "CKD", "ASCVD"], "hba1c_effect": (0.7, 0.3)},  # init >=20
+    "GLP1_RA": {"type": "Injectable", "contra_egfr": 15, "benefit": ["ASCVD", "Weight", "CKD_Secondary"], "hba1c_effect": (1.2, 0.4)},
+    "GIP_GLP1": {"type": "Injectable", "contra_egfr": 15, "benefit": ["Weight++", "Glycemia++"], "hba1c_effect": (2.0, 0.5)},  # Tirzepatide
+    "DPP4i": {"type": "Oral", "contra_egfr": 0, "conflict": ["GLP1_RA", "GIP_GLP1"], "hba1c_effect": (0.6, 0.3)},
+    "SU": {"type": "Oral", "contra_egfr": 60, "risk": "Hypo", "hba1c_effect": (1.2, 0.4)},
+    "TZD": {"type": "Oral", "contra": "HF", "hba1c_effect": (1.0, 0.4)},
+    "Insulin_Basal": {"type": "Injectable", "risk": "Hypo", "hba1c_effect": (1.5, 0.6)},
+    "Insulin_Prandial": {"type": "Injectable", "risk": "Hypo", "hba1c_effect": (1.0, 0.5)}
+}
+
+# ==========================================
+# SET DE MEDICAMENTE CA BITMASK
+# ==========================================
+# Un bit per cheie din DRUG_CLASSES (în ordinea tabelului). Motorul lucrează pe
+# întregi: apartenență = &, adăugare = |=, oprire = &= ~.
+MED_BITS = {name: 1 << i for i, name in enumerate(DRUG_CLASSES)}
+
+METFORMIN = MED_BITS["Metformin"]
+SGLT2I = MED_BITS["SGLT2i"]
+GLP1_RA = MED_BITS["GLP1_RA"]
+GIP_GLP1 = MED_BITS["GIP_GLP1"]
+DPP4I = MED_BITS["DPP4i"]
+SU = MED_BITS["SU"]
+TZD = MED_BITS["TZD"]
+INSULIN_BASAL = MED_BITS["Insulin_Basal"]
+INSULIN_PRANDIAL = MED_BITS["Insulin_Prandial"]
+
+# Măști de clasă, derivate din baza de cunoștințe
+INCRETINS = sum(MED_BITS[m] for m in DRUG_CLASSES["DPP4i"]["conflict"])
+INSULINS = sum(b for m, b in MED_BITS.items() if m.startswith("Insulin_"))
+HYPO_RISK = sum(MED_BITS[m] for m, info in DRUG_CLASSES.items() if info.get("risk") == "Hypo")
+
+
+class MedSet(int):
+    """Set de clase DRUG_CLASSES stocat ca bitmask; la graniță se comportă ca lista de nume."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_names(cls, names):
+        mask = 0
+        for name in names:
+            mask |= MED_BITS.get(name, 0)  # ca înainte: nume necunoscute sunt ignorate
+        return cls(mask)
+
+    def names(self):
+        return [name for name, bit in MED_BITS.items() if self & bit]
+
+    def __contains__(self, name):
+        return bool(self & MED_BITS.get(name, 0))
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def __len__(self):
+        return bin(self).count("1")
+
+    def __repr__(self):
+        return f"MedSet({self.names()!r})"
+
+
+# ==========================================
+# CATALOG DE ACȚIUNI
+# ==========================================
+# Fiecare acțiune pe care o poate emite motorul, în ordinea în care apare în plan.
+# Codul unei acțiuni = poziția ei aici; planul intern e o listă de coduri, iar
+# textele (text / reason / ref) vin din messages.py abia la export / randare.
+# (cheie, type)
+ACTION_TYPES = (
+    # PASUL 1: SIGURANȚĂ & SANITIZARE
+    ("STOP_METFORMIN", "STOP"),
+    ("ALERT_METFORMIN_DOSE", "ALERT"),
+    ("ALERT_SGLT2I_LOW_EGFR", "ALERT"),
+    ("STOP_TZD", "STOP"),
+    ("STOP_DPP4I_SAFETY", "STOP"),
+    ("ALERT_SGLT2I_PAUSE", "ALERT"),
+    # PASUL 2: RED FLAGS
+    ("START_BASAL_RED_FLAGS", "START"),
+    ("STOP_SU_RED_FLAGS", "STOP"),
+    ("START_RAPID_INTENSIFICATION", "START"),
+    # PASUL 3: PROTECȚIE DE ORGAN
+    ("START_SGLT2I_HF", "START"),
+    ("START_SGLT2I_CKD", "START"),
+    ("START_GLP1_CKD", "START"),
+    ("STOP_DPP4I_CKD", "STOP"),
+    ("START_SGLT2I_ASCVD", "START"),
+    ("ALERT_SWITCH_GLP1_ASCVD", "ALERT"),
+    ("START_CV_AGENT_ASCVD", "START"),
+    ("STOP_DPP4I_ASCVD", "STOP"),
+    # PASUL 4: INTENSIFICARE GLICEMICĂ & PONDERALĂ
+    ("START_EARLY_COMBO", "START"),
+    ("START_METFORMIN", "START"),
+    ("START_INCRETIN_WEIGHT", "START"),
+    ("STOP_DPP4I_WEIGHT", "STOP"),
+    ("SWITCH_DPP4I_GLP1", "SWITCH"),
+    ("START_GLP1_BEFORE_INSULIN", "START"),
+    ("STOP_DPP4I_GLP1", "STOP"),
+    ("START_BASAL_SEVERE", "START"),
+    ("STOP_SU_BASAL_SEVERE", "STOP"),
+    ("START_BASAL", "START"),
+    ("STOP_SU_BASAL", "STOP"),
+    ("START_PRANDIAL", "START"),
+    ("STOP_SU_PRANDIAL", "STOP"),
+)
+
+ACTION_KEYS = tuple(key for key, _ in ACTION_TYPES)
+ACTION_INDEX = {key: i for i, key in enumerate(ACTION_KEYS)}
+
+
+@lru_cache(maxsize=None)
+def action_messages(lang=DEFAULT_LANGUAGE):
+    """(text, reason, ref) pentru fiecare cod de acțiune, în limba `lang`."""
+    if lang not in MESSAGES:
+        raise ValueError(f"Limbă necunoscută: {lang!r} (disponibile: {', '.join(MESSAGES)})")
+    catalog = MESSAGES[lang]
+    missing = [key for key in ACTION_KEYS if key not in catalog]
+    if missing:
+        raise ValueError(f"Catalogul {lang!r} nu are mesaje pentru: {', '.join(missing)}")
+    return tuple(catalog[key] for key in ACTION_KEYS)
+
+
+class Action:
+    """Înregistrare compactă a unei acțiuni: codul + cheia + tipul, fără texte.
+
+    Există o singură instanță per cod (ACTION_RECORDS); textele se rezolvă la cerere.
+    """
+
+    __slots__ = ("code", "key", "type")
+
+    def __init__(self, code):
+        self.code = code
+        self.key, self.type = ACTION_TYPES[code]
+
+    def __repr__(self):
+        return f"Action({self.key})"
+
+    def __reduce__(self):
+        return _action_record, (self.code,)
+
+    def message(self, lang=DEFAULT_LANGUAGE):
+        return action_messages(lang)[self.code]
+
+    def as_dict(self, lang=DEFAULT_LANGUAGE):
+        text, reason, ref = action_messages(lang)[self.code]
+        return {"type": self.type, "text": text, "reason": reason, "ref": ref}
+
+
+ACTION_RECORDS = tuple(Action(code) for code in range(len(ACTION_TYPES)))
+
+
+def _action_record(code):
+    return ACTION_RECORDS[code]
+
+
+@lru_cache(maxsize=None)
+def _action_dicts(lang):
+    return tuple(record.as_dict(lang) for record in ACTION_RECORDS)
+
+
+_DEFAULT_DICTS = _action_dicts(DEFAULT_LANGUAGE)
+
+
+def expand_plan(codes, lang=DEFAULT_LANGUAGE):
+    """Coduri de acțiune -> plan ca listă de dict-uri (type, text, reason, ref), ca generate_plan.
+
+    Dict-urile sunt partajate între planuri (câte unul per acțiune și limbă): se citesc, nu se modifică.
+    """
+    dicts = _action_dicts(lang)
+    return [dicts[code] for code in codes]
+
+
+# ==========================================
+# FAPTE: condiții statice per pacient
+# ==========================================
+# Tot ce nu depinde de medicația simulată se calculează o singură dată per apel,
+# ca bitmask de fapte. Pragurile vin din DRUG_CLASSES; expresiile sunt compilate
+# la import într-o singură funcție (patient_facts).
+_METFORMIN_STOP_EGFR = DRUG_CLASSES["Metformin"]["contra_egfr"]
+_METFORMIN_DOSE_EGFR = DRUG_CLASSES["Metformin"]["warning_egfr"]
+_SGLT2I_INIT_EGFR = DRUG_CLASSES["SGLT2i"]["contra_egfr"]
+
+FACT_INPUTS = ("hba1c", "target", "egfr", "bmi", "ascvd", "hf", "ckd", "newly_dx",
+               "catabolic", "ketosis", "acute_illness", "suspected_t1d")
+
+FACTS = {
+    "ascvd": "ascvd",
+    "hf": "hf",
+    "ckd": "ckd",
+    "newly_dx": "newly_dx",
+    "red_flags": "suspected_t1d or ketosis or catabolic or acute_illness",
+    "sglt2_paused": "ketosis or acute_illness",
+    "sglt2_initiable": f"egfr >= {_SGLT2I_INIT_EGFR} and not (ketosis or acute_illness)",
+    "sglt2_preferred": f"egfr >= {_SGLT2I_INIT_EGFR} and not (ketosis or acute_illness) and bmi <= 27",
+    "metformin_contra": f"egfr < {_METFORMIN_STOP_EGFR}",
+    "metformin_reduce": f"egfr < {_METFORMIN_DOSE_EGFR}",
+    "sglt2_contra": f"egfr < {_SGLT2I_INIT_EGFR}",
+    "obese": "bmi >= 30",
+    "severe_hba1c": "hba1c >= 10",
+    "above_target": "hba1c - target > 0",
+    "gap>0.5": "hba1c - target > 0.5",
+    "gap>=1.5": "hba1c - target >= 1.5",
+}
+FACT_BITS = {name: 1 << i for i, name in enumerate(FACTS)}
+# fapt -> câmpurile de input citite de expresia lui
+FACT_DEPENDS = {
+    name: frozenset(compile(expr, name, "eval").co_names) & set(FACT_INPUTS) for name, expr in FACTS.items()
+}
+
+
+def _compile_facts():
+    terms = " | ".join(f"({bit} if {FACTS[name]} else 0)" for name, bit in FACT_BITS.items())
+    source = f"def patient_facts({', '.join(FACT_INPUTS)}):\n    return {terms}\n"
+    namespace = {}
+    exec(compile(source, "<engine.FACTS>", "exec"), namespace)
+    return namespace["patient_facts"]
+
+
+patient_facts = _compile_facts()
+
+
+# ==========================================
+# REGULI DECLARATIVE
+# ==========================================
+def _mask(names):
+    mask = 0
+    for name in names:
+        mask |= MED_BITS[name]
+    return mask
+
+
+class Rule:
+    """O regulă = gardă (fapte + medicație simulată) -> acțiune + efect asupra medicației.
+
+    when/unless: fapte care trebuie să fie adevărate/false (statice, indexate).
+    has/has_any/lacks: medicația simulată în momentul evaluării (toate/măcar una/niciuna).
+    start/stop: clase adăugate/scoase din medicația simulată dacă regula se aplică.
+    then: reguli evaluate doar imediat după ce aceasta s-a aplicat.
+    key=None: regulă fără acțiune în plan (doar efect).
+    """
+
+    __slots__ = ("key", "step", "when", "unless", "has", "has_any", "lacks", "guard", "start", "stop", "then", "code")
+
+    def __init__(self, key, step, when=(), unless=(), has=(), has_any=(), lacks=(), start=(), stop=(), then=()):
+        self.key = key
+        self.step = step
+        self.when = sum(FACT_BITS[f] for f in when)
+        self.unless = sum(FACT_BITS[f] for f in unless)
+        self.has = _mask(has)
+        self.has_any = _mask(has_any)
+        self.lacks = _mask(lacks)
+        self.guard = self.has | self.lacks  # meds & guard == has <=> are tot din has și nimic din lacks
+        self.start = _mask(start)
+        self.stop = _mask(stop)
+        self.then = tuple(then)
+        self.code = ACTION_INDEX[key] if key else None
+
+    def __repr__(self):
+        return f"Rule({self.key!r}, {self.step!r})"
+
+
+_INCRETINS = DRUG_CLASSES["DPP4i"]["conflict"]
+_TZD_CONTRA = DRUG_CLASSES["TZD"]["contra"].lower()
+
+
+def _stop_dpp4(key, step):
+    return Rule(key, step, has=["DPP4i"], has_any=_INCRETINS, stop=["DPP4i"])
+
+
+def _stop_su(key, step):
+    return Rule(key, step, has=["SU"], stop=["SU"])
+
+
+SAFETY, RED_FLAGS, ORGAN_PROTECTION, INTENSIFICATION = "safety", "red_flags", "organ_protection", "intensification"
+STEPS = (SAFETY, RED_FLAGS, ORGAN_PROTECTION, INTENSIFICATION)
+
+RULES = (
+    # -----------------------------------------------------
+    # PASUL 1: SIGURANȚĂ & SANITIZARE
+    # -----------------------------------------------------
+    Rule("STOP_METFORMIN", SAFETY, when=["metformin_contra"], has=["Metformin"], stop=["Metformin"]),
+    Rule("ALERT_METFORMIN_DOSE", SAFETY, when=["metformin_reduce"], has=["Metformin"]),
+    # SGLT2i: NU inițiați sub prag, dar NU opriți automat dacă deja e inițiat și tolerat
+    Rule("ALERT_SGLT2I_LOW_EGFR", SAFETY, when=["sglt2_contra"], has=["SGLT2i"]),
+    Rule("STOP_TZD", SAFETY, when=[_TZD_CONTRA], has=["TZD"], stop=["TZD"]),
+    # Redundanță incretinică
+    _stop_dpp4("STOP_DPP4I_SAFETY", SAFETY),
+    # Situații de siguranță unde SGLT2i se evită temporar (ketoză/boală acută)
+    Rule("ALERT_SGLT2I_PAUSE", SAFETY, when=["sglt2_paused"], has=["SGLT2i"]),
+    # -----------------------------------------------------
+    # PASUL 2: RED FLAGS -> INSULINĂ (nu doar HbA1c)
+    # -----------------------------------------------------
+    Rule("START_BASAL_RED_FLAGS", RED_FLAGS, when=["red_flags"], lacks=["Insulin_Basal"], start=["Insulin_Basal"]),
+    Rule("STOP_SU_RED_FLAGS", RED_FLAGS, when=["red_flags"], has=["SU"], stop=["SU"]),
+    Rule("START_RAPID_INTENSIFICATION", RED_FLAGS, when=["red_flags", "severe_hba1c"], lacks=["Insulin_Prandial"]),
+    # -----------------------------------------------------
+    # PASUL 3: PROTECȚIE DE ORGAN (independent de A1c/metformin)
+    # -----------------------------------------------------
+    Rule("START_SGLT2I_HF", ORGAN_PROTECTION, when=["hf", "sglt2_initiable"], lacks=["SGLT2i"], start=["SGLT2i"]),
+    Rule("START_SGLT2I_CKD", ORGAN_PROTECTION, when=["ckd", "sglt2_initiable"], lacks=["SGLT2i"], start=["SGLT2i"]),
+    Rule("START_GLP1_CKD", ORGAN_PROTECTION, when=["ckd", "sglt2_contra"], lacks=["SGLT2i"] + _INCRETINS,
+         start=["GLP1_RA"], then=[_stop_dpp4("STOP_DPP4I_CKD", ORGAN_PROTECTION)]),
+    # ASCVD: strict 2022 -> “proven CV benefit” doar SGLT2i sau GLP-1 RA (nu GIP/GLP1 automat)
+    Rule("START_SGLT2I_ASCVD", ORGAN_PROTECTION, when=["ascvd", "sglt2_initiable"], has=["GIP_GLP1"],
+         lacks=["SGLT2i", "GLP1_RA"], start=["SGLT2i"]),
+    Rule("ALERT_SWITCH_GLP1_ASCVD", ORGAN_PROTECTION, when=["ascvd"], unless=["sglt2_initiable"], has=["GIP_GLP1"],
+         lacks=["SGLT2i", "GLP1_RA"]),
+    Rule("START_CV_AGENT_ASCVD", ORGAN_PROTECTION, when=["ascvd", "sglt2_preferred"],
+         lacks=["SGLT2i", "GLP1_RA", "GIP_GLP1"], start=["SGLT2i"]),
+    Rule("START_CV_AGENT_ASCVD", ORGAN_PROTECTION, when=["ascvd"], unless=["sglt2_preferred"],
+         lacks=["SGLT2i", "GLP1_RA", "GIP_GLP1"], start=["GLP1_RA"],
+         then=[_stop_dpp4("STOP_DPP4I_ASCVD", ORGAN_PROTECTION)]),
+    # -----------------------------------------------------
+    # PASUL 4: INTENSIFICARE GLICEMICĂ & PONDERALĂ
+    # -----------------------------------------------------
+    Rule("START_EARLY_COMBO", INTENSIFICATION, when=["above_target", "newly_dx", "gap>=1.5"]),
+    Rule("START_METFORMIN", INTENSIFICATION, when=["above_target"], unless=["metformin_contra"],
+         lacks=["Metformin"], start=["Metformin"]),
+    Rule("START_INCRETIN_WEIGHT", INTENSIFICATION, when=["above_target", "obese"],
+         lacks=["SGLT2i"] + _INCRETINS, start=["GIP_GLP1"],
+         then=[_stop_dpp4("STOP_DPP4I_WEIGHT", INTENSIFICATION)]),
+    Rule("SWITCH_DPP4I_GLP1", INTENSIFICATION, when=["above_target", "gap>0.5"], has=["DPP4i"], stop=["DPP4i"],
+         then=[Rule(None, INTENSIFICATION, lacks=_INCRETINS, start=["GLP1_RA"])]),
+    # GLP-1 înainte de insulină (dacă nu există red flags și HbA1c nu e extremă)
+    Rule("START_GLP1_BEFORE_INSULIN", INTENSIFICATION, when=["above_target"], unless=["red_flags", "severe_hba1c"],
+         lacks=["Insulin_Basal"] + _INCRETINS, start=["GLP1_RA"],
+         then=[_stop_dpp4("STOP_DPP4I_GLP1", INTENSIFICATION)]),
+    Rule("START_BASAL_SEVERE", INTENSIFICATION, when=["above_target", "severe_hba1c"], unless=["red_flags"],
+         lacks=["Insulin_Basal"] + _INCRETINS, start=["Insulin_Basal"],
+         then=[_stop_su("STOP_SU_BASAL_SEVERE", INTENSIFICATION)]),
+    # Dacă deja are incretin și e încă peste țintă -> adaugă insulină bazală
+    Rule("START_BASAL", INTENSIFICATION, when=["above_target"], has_any=_INCRETINS, lacks=["Insulin_Basal"],
+         start=["Insulin_Basal"], then=[_stop_su("STOP_SU_BASAL", INTENSIFICATION)]),
+    # Dacă deja are bazală și încă e peste țintă -> prandial
+    Rule("START_PRANDIAL", INTENSIFICATION, when=["above_target"], has=["Insulin_Basal"], lacks=["Insulin_Prandial"],
+         start=["Insulin_Prandial"], then=[_stop_su("STOP_SU_PRANDIAL", INTENSIFICATION)]),
+)
+
+
+@lru_cache(maxsize=None)
+def rules_for(facts):
+    """Regulile (în ordine) ale căror gărzi statice pot fi adevărate pentru acest set de fapte."""
+    return tuple(r for r in RULES if not (r.when & ~facts or r.unless & facts))
+
+
+def _apply(rules, meds, plan):
+    for rule in rules:
+        if meds & rule.guard != rule.has or (rule.has_any and not meds & rule.has_any):
+            continue
+        if rule.code is not None:
+            plan.append(rule.code)
+        meds = (meds & ~rule.stop) | rule.start
+        if rule.then:
+            meds = _apply(rule.then, meds, plan)
+    return meds
+
+
+def apply_traced(rules, meds, plan, fired):
+    """Ca _apply, dar adaugă în `fired` (regulă, meds înainte, meds după) pentru fiecare regulă aplicată."""
+    for rule in rules:
+        if meds & rule.guard != rule.has or (rule.has_any and not meds & rule.has_any):
+            continue
+        before = meds
+        if rule.code is not None:
+            plan.append(rule.code)
+        meds = (meds & ~rule.stop) | rule.start
+        fired.append((rule, before, meds))
+        if rule.then:
+            meds = apply_traced(rule.then, meds, plan, fired)
+    return meds
+
+
+# Instrumentare opțională (vezi instrumentation.py). Dezactivată = o singură
+# comparație cu None per apel.
+_observer = None
+
+
+def set_observer(observer):
+    """observer.evaluate(meds, facts, plan) preia evaluarea; None = cale normală."""
+    global _observer
+    _observer = observer
+
+
+# Jurnal de audit opțional (vezi audit_log.py): fiecare apel generate_plan, cu
+# intrările și codurile rezultate. Tot o comparație cu None când e oprit.
+_recorder = None
+
+
+def set_recorder(recorder):
+    """recorder.record(<argumentele generate_plan>, codes) primește fiecare plan generat; None = oprit."""
+    global _recorder
+    _recorder = recorder
+
+
+# ==========================================
+# MOTORUL DE DECIZIE (CORECTAT)
+# ==========================================
+def evaluate_facts(meds, facts, plan):
+    """Aplică regulile pentru un set de fapte: adaugă codurile în `plan`, întoarce medicația simulată finală."""
+    if _observer is not None:
+        return _observer.evaluate(meds, facts, plan)
+    return _apply(rules_for(facts), meds, plan)
+
+
+def plan_codes(meds, hba1c, target, egfr, bmi, ascvd, hf, ckd, age, newly_dx, catabolic, ketosis, acute_illness, suspected_t1d):
+    """Planul ca listă de coduri de acțiune (indecși în ACTION_TYPES / ACTION_RECORDS), fără texte."""
+    # meds: listă de chei DRUG_CLASSES sau direct un bitmask (MedSet / int)
+    plan = []
+    simulated_meds = meds if isinstance(meds, int) else MedSet.from_names(meds)
+    facts = patient_facts(hba1c, target, egfr, bmi, ascvd, hf, ckd, newly_dx, catabolic, ketosis,
+                          acute_illness, suspected_t1d)
+    evaluate_facts(simulated_meds, facts, plan)
+    return plan
+
+
+def generate_plan(meds, hba1c, target, egfr, bmi, ascvd, hf, ckd, age, newly_dx, catabolic, ketosis, acute_illness, suspected_t1d):
+    """Planul ca listă de dict-uri (type, text, reason, ref) în limba implicită; dict-urile sunt partajate (vezi expand_plan)."""
+    plan = []
+    simulated_meds = meds if isinstance(meds, int) else MedSet.from_names(meds)
+    facts = patient_facts(hba1c, target, egfr, bmi, ascvd, hf, ckd, newly_dx, catabolic, ketosis,
+                          acute_illness, suspected_t1d)
+    evaluate_facts(simulated_meds, facts, plan)
+    if _recorder is not None:
+        _recorder.record(simulated_meds, hba1c, target, egfr, bmi, ascvd, hf, ckd, age, newly_dx, catabolic,
+                         ketosis, acute_illness, suspected_t1d, plan)
+    dicts = _DEFAULT_DICTS
+    return [dicts[code] for code in plan]
+
+
+# ==========================================
+# NORMALIZARE INPUT (CLI / servicii)
+# ==========================================
+PATIENT_NUMERICS = ("hba1c", "target", "egfr", "bmi")
+PATIENT_FLAGS = ("ascvd", "hf", "ckd", "newly_dx", "catabolic", "ketosis", "acute_illness", "suspected_t1d")
+
+_TRUE = {"1", "true", "t", "yes", "y", "da"}
+_FALSE = {"", "0", "false", "f", "no", "n", "nu"}
+
+
+def _as_flag(name, value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and math.isfinite(value):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in _TRUE | _FALSE:
+        return value.strip().lower() in _TRUE
+    raise ValueError(f"{name}: valoare booleană invalidă {value!r}")
+
+
+def _as_number(name, value):
+    if value is None or value == "" or isinstance(value, bool):
+        raise ValueError(f"{name}: valoare numerică lipsă sau invalidă {value!r}")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name}: valoare numerică invalidă {value!r}") from None
+    if not math.isfinite(number):  # NaN ar face toate faptele false -> plan gol ("la țintă")
+        raise ValueError(f"{name}: valoare numerică invalidă {value!r}")
+    return number
+
+
+def parse_patient(record):
+    """Transformă un rând JSON/CSV (dict) în argumentele lui generate_plan.
+
+    Medicația vine fie ca "meds" (listă sau text separat prin ";"/","), fie ca
+    câte un câmp boolean per cheie din DRUG_CLASSES. Ridică ValueError la input invalid.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Pacientul trebuie să fie un obiect JSON / rând CSV")
+
+    meds = record.get("meds")
+    if meds is None:
+        meds = [m for m in DRUG_CLASSES if _as_flag(m, record.get(m, False))]
+    elif isinstance(meds, str):
+        meds = [m.strip() for m in meds.replace(",", ";").split(";") if m.strip()]
+    elif isinstance(meds, (list, tuple)):
+        meds = list(meds)
+    else:
+        raise ValueError(f"meds: format invalid {meds!r}")
+    if not all(isinstance(m, str) for m in meds):
+        raise ValueError(f"meds: se așteaptă nume de clase (text), nu {meds!r}")
+    unknown = [m for m in meds if m not in DRUG_CLASSES]
+    if unknown:
+        raise ValueError(f"meds: clase necunoscute {', '.join(map(str, unknown))}")
+
+    patient = {"meds": list(dict.fromkeys(meds))}
+    for name in PATIENT_NUMERICS:
+        patient[name] = _as_number(name, record.get(name))
+    for name in PATIENT_FLAGS:
+        patient[name] = _as_flag(name, record.get(name, False))
+    age = record.get("age")
+    patient["age"] = None if age in (None, "") else _as_number("age", age)
+    return patient
+
+
+# ==========================================
+# CHEIE CANONICĂ (cache-uri)
+# ==========================================
+def plan_key(meds, hba1c, target, egfr, bmi, ascvd, hf, ckd, age, newly_dx, catabolic, ketosis, acute_illness, suspected_t1d):
+    """Întreg care determină complet planul: medicația (bitmask) + faptele pacientului.
+
+    Doi pacienți cu aceeași cheie primesc exact același plan, deci cheia poate fi
+    folosită pentru memoizare fără risc de a amesteca cazuri diferite.
+    """
+    med_mask = meds if isinstance(meds, int) else MedSet.from_names(meds)
+    facts = patient_facts(hba1c, target, egfr, bmi, ascvd, hf, ckd, newly_dx, catabolic, ketosis,
+                          acute_illness, suspected_t1d)
+    return med_mask << len(FACTS) | facts
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import engine
+from engine import FACT_BITS, MED_BITS, RULES, STEPS, MedSet, apply_traced, rules_for
+
+# ==========================================
+# INSTRUMENTARE PER REGULĂ
+# ==========================================
+# inst = instrumentation.enable()          # generate_plan trece prin inst.evaluate
+# inst.write("plan_metrics.prom")          # sau .json
+# inst.serve(9464)                         # /metrics (Prometheus) și /snapshot.json
+# instrumentation.disable()
+#
+# Colectează: câte evaluări, de câte ori s-a aplicat fiecare regulă, histograme de
+# timp per pas (safety / red_flags / organ_protection / intensification) și un
+# jurnal circular cu motivul fiecărei acțiuni emise. Cu instrumentarea dezactivată,
+# generate_plan nu plătește decât o comparație cu None.
+
+# limite histogramă (secunde), ca în convenția Prometheus
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, float("inf"))
+
+_FACT_NAMES = tuple(FACT_BITS)
+
+
+def _names(mask, bits):
+    return [name for name, bit in bits.items() if mask & bit]
+
+
+@lru_cache(maxsize=None)
+def steps_for(facts):
+    """Regulile aplicabile, grupate pe pași (în ordinea din RULES)."""
+    rules = rules_for(facts)
+    return tuple((step, tuple(r for r in rules if r.step == step)) for step in STEPS)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for i, limit in enumerate(BUCKETS):
+            if seconds <= limit:
+                self.counts[i] += 1
+                break
+        self.sum += seconds
+        self.count += 1
+
+    def as_dict(self):
+        cumulative, total = [], 0
+        for limit, n in zip(BUCKETS, self.counts):
+            total += n
+            cumulative.append(["+Inf" if limit == float("inf") else limit, total])
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+class Instrumentation:
+    def __init__(self, trace_size=1000, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.evaluations = 0
+        self.rule_hits = {(r.key, r.step): 0 for r in _all_rules() if r.key}
+        self.steps = {step: Histogram() for step in STEPS}
+        self.total = Histogram()
+        self.traces = deque(maxlen=trace_size)
+        self._lock = threading.Lock()
+        self._server = None
+
+    # apelat de engine.generate_plan
+    def evaluate(self, meds, facts, plan):
+        clock = self.clock
+        fired = []
+        durations = []
+        start = clock()
+        for step, rules in steps_for(facts):
+            t = clock()
+            meds = apply_traced(rules, meds, plan, fired)
+            durations.append((step, clock() - t))
+        total = clock() - start
+        with self._lock:
+            self.evaluations += 1
+            self.total.observe(total / 1e9)
+            for step, ns in durations:
+                self.steps[step].observe(ns / 1e9)
+            for rule, _, _ in fired:
+                if rule.key:
+                    self.rule_hits[rule.key, rule.step] += 1
+            if self.traces.maxlen:
+                self.traces.append((time.time(), facts, fired))
+        return meds
+
+    # ------------------------------
+    # export
+    # ------------------------------
+    def trace(self):
+        """Jurnalul recent: pentru fiecare evaluare, acțiunile emise și de ce."""
+        with self._lock:
+            records = list(self.traces)
+        out = []
+        for ts, facts, fired in records:
+            actions = []
+            for rule, before, after in fired:
+                actions.append({
+                    "action": rule.key,
+                    "step": rule.step,
+                    "when": _names(rule.when, FACT_BITS),
+                    "unless": _names(rule.unless, FACT_BITS),
+                    "has": _names(rule.has, MED_BITS),
+                    "has_any": _names(rule.has_any, MED_BITS),
+                    "lacks": _names(rule.lacks, MED_BITS),
+                    "meds_before": MedSet(before).names(),
+                    "meds_after": MedSet(after).names(),
+                })
+            out.append({"time": ts, "facts": _names(facts, FACT_BITS), "actions": actions})
+        return out
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "evaluations": self.evaluations,
+                "rule_hits": [
+                    {"rule": key, "step": step, "hits": hits} for (key, step), hits in self.rule_hits.items()
+                ],
+                "step_duration_seconds": {step: h.as_dict() for step, h in self.steps.items()},
+                "evaluation_duration_seconds": self.total.as_dict(),
+            }
+
+    def prometheus_text(self):
+        snap = self.snapshot()
+        lines = [
+            "# HELP plan_evaluations_total Evaluări generate_plan instrumentate.",
+            "# TYPE plan_evaluations_total counter",
+            f"plan_evaluations_total {snap['evaluations']}",
+            "# HELP plan_rule_hits_total De câte ori a emis fiecare regulă acțiunea ei.",
+            "# TYPE plan_rule_hits_total counter",
+        ]
+        for item in snap["rule_hits"]:
+            lines.append(f'plan_rule_hits_total{{rule="{item["rule"]}",step="{item["step"]}"}} {item["hits"]}')
+        lines += [
+            "# HELP plan_step_duration_seconds Timpul petrecut în fiecare pas al algoritmului.",
+            "# TYPE plan_step_duration_seconds histogram",
+        ]
+        for step, hist in snap["step_duration_seconds"].items():
+            lines += _histogram_lines("plan_step_duration_seconds", f'step="{step}"', hist)
+        lines += [
+            "# HELP plan_evaluation_duration_seconds Timpul total de evaluare a regulilor.",
+            "# TYPE plan_evaluation_duration_seconds histogram",
+        ]
+        lines += _histogram_lines("plan_evaluation_duration_seconds", "", snap["evaluation_duration_seconds"])
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Scrie atomic snapshot-ul: .json -> JSON (cu jurnal), altfel format text Prometheus."""
+        if path.endswith(".json"):
+            text = json.dumps(dict(self.snapshot(), trace=self.trace()), ensure_ascii=False, indent=2)
+        else:
+            text = self.prometheus_text()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Pornește (o singură dată) un endpoint HTTP local: /metrics și /snapshot.json."""
+        if self._server is None:
+            self._server = ThreadingHTTPServer((host, port), _handler(self))
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _all_rules():
+    pending = list(RULES)
+    while pending:
+        rule = pending.pop(0)
+        yield rule
+        pending[:0] = rule.then
+
+
+def _histogram_lines(name, labels, hist):
+    sep = "," if labels else ""
+    lines = [f'{name}_bucket{{{labels}{sep}le="{le}"}} {n}' for le, n in hist["buckets"]]
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {hist['sum']}")
+    lines.append(f"{name}_count{suffix} {hist['count']}")
+    return lines
+
+
+def _handler(inst):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, ctype = inst.prometheus_text(), "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path == "/snapshot.json":
+                body = json.dumps(dict(inst.snapshot(), trace=inst.trace()), ensure_ascii=False)
+                ctype = "application/json; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def enable(trace_size=1000):
+    """Activează instrumentarea pentru tot procesul și întoarce colectorul."""
+    inst = Instrumentation(trace_size=trace_size)
+    engine.set_observer(inst)
+    return inst
+
+
+def disable():
+    engine.set_observer(None)
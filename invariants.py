@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+from engine import (
+    ACTION_KEYS, DPP4I, DRUG_CLASSES, FACT_INPUTS, GIP_GLP1, GLP1_RA, INCRETINS, INSULIN_BASAL, INSULINS, METFORMIN,
+    PATIENT_FLAGS, SGLT2I, SU, TZD, MedSet, evaluate_facts, patient_facts,
+)
+from whatif import thresholds
+
+# ==========================================
+# VERIFICARE EXHAUSTIVĂ A INVARIANȚILOR DE SIGURANȚĂ
+# ==========================================
+# python invariants.py --workers 0
+# Spațiul pe benzi: 9 medicamente x 8 flag-uri x benzile numerice. Benzile nu
+# sunt fixe: pragurile se extrag din engine.FACTS la fiecare rulare (whatif.thresholds)
+# plus pragurile invarianților, iar fiecare variabilă ia exact valoarea pragului și
+# câte o valoare din fiecare interval. Deci o editare de prag e acoperită automat.
+# Spațiul se reduce apoi fără pierdere la clase de echivalență:
+# planul depinde doar de (medicație, fapte), iar invarianții doar de condițiile lor
+# "when" pe pacient. Motorul rulează o singură dată per (medicație, fapte)
+# (evaluate_facts, exact calea din generate_plan), distribuit pe toate nucleele.
+# Ieșire 1 + contraexemple concrete (pacient + plan) dacă un invariant e încălcat.
+
+# Limitele promise, scrise aici explicit și nu citite din DRUG_CLASSES: un prag
+# greșit în baza de cunoștințe trebuie să apară ca încălcare, nu să se valideze singur.
+_SGLT2_MIN_EGFR = 20
+_METFORMIN_MIN_EGFR = 30
+_SEVERE_HBA1C = 10
+
+# pragurile citite de invarianți (pe lângă cele din engine.FACTS)
+INVARIANT_CUTS = {"egfr": (_SGLT2_MIN_EGFR, _METFORMIN_MIN_EGFR), "hba1c": (_SEVERE_HBA1C,)}
+MED_COMBINATIONS = 1 << len(DRUG_CLASSES)
+
+
+class Invariant:
+    """Un invariant = condiție pe pacient (when) + încălcare pe plan (violated).
+
+    when(patient) -> bool folosește praguri proprii (nu faptele motorului), ca o
+    regulă greșită să nu se poată "verifica" singură.
+    violated(before, after, codes) -> bool; before / after = medicația (bitmask)
+    înainte / după plan, codes = codurile acțiunilor.
+    """
+
+    __slots__ = ("name", "description", "when", "violated")
+
+    def __init__(self, name, description, violated, when=None):
+        self.name = name
+        self.description = description
+        self.violated = violated
+        self.when = when or (lambda patient: True)
+
+
+def _started(before, after, mask):
+    return after & ~before & mask
+
+
+def _red_flags(p):
+    return p["suspected_t1d"] or p["ketosis"] or p["catabolic"] or p["acute_illness"]
+
+
+INVARIANTS = (
+    Invariant("dpp4_with_incretin", "DPP-4i nu rămâne alături de GLP-1 RA / GIP-GLP-1 RA",
+              lambda before, after, codes: after & DPP4I and after & INCRETINS),
+    Invariant("su_after_insulin_start", "SU nu rămâne după inițierea insulinei (bazale sau prandiale)",
+              lambda before, after, codes: _started(before, after, INSULINS) and after & SU),
+    Invariant("sglt2_start_low_egfr", f"SGLT2i nu se inițiază la eGFR < {_SGLT2_MIN_EGFR}",
+              lambda before, after, codes: _started(before, after, SGLT2I),
+              when=lambda p: p["egfr"] < _SGLT2_MIN_EGFR),
+    Invariant("sglt2_start_ketosis", "SGLT2i nu se inițiază în ketoză sau boală acută",
+              lambda before, after, codes: _started(before, after, SGLT2I),
+              when=lambda p: p["ketosis"] or p["acute_illness"]),
+    Invariant("tzd_with_hf", "TZD nu rămâne la pacientul cu HF",
+              lambda before, after, codes: after & TZD,
+              when=lambda p: p["hf"]),
+    Invariant("metformin_low_egfr", f"Metformin nu rămâne / nu se inițiază la eGFR < {_METFORMIN_MIN_EGFR}",
+              lambda before, after, codes: after & METFORMIN,
+              when=lambda p: p["egfr"] < _METFORMIN_MIN_EGFR),
+    Invariant("basal_before_glp1", "Fără red flags și cu HbA1c < 10%, insulina bazală se inițiază doar pe GLP-1 RA / GIP-GLP-1 RA",
+              lambda before, after, codes: _started(before, after, INSULIN_BASAL) and not after & (GLP1_RA | GIP_GLP1),
+              when=lambda p: p["hba1c"] < _SEVERE_HBA1C and not _red_flags(p)),
+    Invariant("plan_order", "Acțiunile apar o singură dată, în ordinea din catalog",
+              lambda before, after, codes: len(codes) > 1 and codes != sorted(set(codes))),
+)
+
+
+def band_values(var):
+    """Valori reprezentative: fiecare prag + câte o valoare din fiecare interval dintre praguri."""
+    cuts = {c for c, _ in thresholds().get(var, ())} | set(INVARIANT_CUTS.get(var, ()))
+    cuts = sorted(cuts)
+    if not cuts:
+        return [0.0]
+    values = [cuts[0] - 1]
+    for lo, hi in zip(cuts, cuts[1:] + [cuts[-1] + 2]):
+        values += [lo, (lo + hi) / 2]
+    return values
+
+
+def patients():
+    """Toate combinațiile flag-uri x benzi numerice (fără medicație)."""
+    numeric = [band_values(var) for var in ("egfr", "bmi", "hba1c", "gap")]
+    for flags in range(1 << len(PATIENT_FLAGS)):
+        base = {name: bool(flags >> bit & 1) for bit, name in enumerate(PATIENT_FLAGS)}
+        for egfr, bmi, hba1c, gap in product(*numeric):
+            yield dict(base, hba1c=hba1c, target=hba1c - gap, egfr=egfr, bmi=bmi, age=None)
+
+
+_classes = None
+
+
+def equivalence_classes():
+    """[(fapte, pacient reprezentativ, invarianți aplicabili, nr. combinații non-medicație)].
+
+    Două combinații sunt echivalente dacă au aceleași fapte (deci același plan pentru
+    orice medicație) și aceiași invarianți aplicabili. Calculat o dată per proces.
+    """
+    global _classes
+    if _classes is None:
+        groups = {}
+        for patient in patients():
+            facts = patient_facts(*(patient[name] for name in FACT_INPUTS))
+            applicable = tuple(inv for inv in INVARIANTS if inv.when(patient))
+            key = (facts, applicable)
+            if key in groups:
+                groups[key][3] += 1
+            else:
+                groups[key] = [facts, patient, applicable, 1]
+        _classes = [tuple(group) for group in groups.values()]
+    return _classes
+
+
+def check_meds(med_masks, examples=5):
+    """Verifică toate clasele pentru medicațiile date. Întoarce (evaluări, combinații acoperite, încălcări)."""
+    classes = equivalence_classes()
+    violations = {inv.name: {"count": 0, "examples": []} for inv in INVARIANTS}
+    evaluations = covered = 0
+    for before in med_masks:
+        outcomes = {}  # fapte -> (medicație după, coduri); planul nu depinde de altceva
+        for facts, patient, applicable, weight in classes:
+            outcome = outcomes.get(facts)
+            if outcome is None:
+                codes = []
+                outcome = outcomes[facts] = (evaluate_facts(before, facts, codes), codes)
+                evaluations += 1
+            after, codes = outcome
+            covered += weight
+            for inv in applicable:
+                if not inv.violated(before, after, codes):
+                    continue
+                found = violations[inv.name]
+                found["count"] += weight
+                if len(found["examples"]) < examples:
+                    found["examples"].append({
+                        "patient": dict(patient, meds=MedSet(before).names()),
+                        "plan": [ACTION_KEYS[c] for c in codes],
+                        "meds_after": MedSet(after).names(),
+                    })
+    return evaluations, covered, violations
+
+
+def _merge(total, part, examples):
+    for name, found in part.items():
+        total[name]["count"] += found["count"]
+        room = examples - len(total[name]["examples"])
+        total[name]["examples"] += found["examples"][:max(room, 0)]
+
+
+def run(workers=1, examples=5):
+    """Verificarea completă; raport JSON-serializabil."""
+    start = time.perf_counter()
+    masks = range(MED_COMBINATIONS)
+    report = {inv.name: {"description": inv.description, "count": 0, "examples": []} for inv in INVARIANTS}
+    evaluations = covered = 0
+    if workers <= 1:
+        parts = [check_meds(masks, examples)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = [masks[i::workers * 4] for i in range(workers * 4)]
+            parts = list(pool.map(check_meds, chunks, [examples] * len(chunks)))
+    for n, c, part in parts:
+        evaluations += n
+        covered += c
+        _merge(report, part, examples)
+    return {
+        "space": MED_COMBINATIONS * sum(weight for *_, weight in equivalence_classes()),
+        "covered": covered,
+        "evaluations": evaluations,
+        "seconds": round(time.perf_counter() - start, 2),
+        "violations": {name: found for name, found in report.items() if found["count"]},
+        "invariants": [inv.name for inv in INVARIANTS],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifică exhaustiv invarianții de siguranță ai generate_plan")
+    parser.add_argument("--workers", type=int, default=0, help="procese paralele (0 = toate nucleele)")
+    parser.add_argument("--examples", type=int, default=5, help="contraexemple raportate per invariant")
+    parser.add_argument("--json", action="store_true", help="raportul complet ca JSON pe stdout")
+    args = parser.parse_args(argv)
+
+    report = run(args.workers or os.cpu_count() or 1, args.examples)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"{report['covered']}/{report['space']} combinații pe benzi, {report['evaluations']} evaluări "
+          f"ale motorului, {len(INVARIANTS)} invarianți, {report['seconds']}s", file=sys.stderr)
+    for name, found in report["violations"].items():
+        print(f"ÎNCĂLCAT {name}: {found['description']} ({found['count']} combinații)", file=sys.stderr)
+        for example in found["examples"]:
+            print(f"  {json.dumps(example, ensure_ascii=False)}", file=sys.stderr)
+    return 1 if report["violations"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# ==========================================
+# CATALOG DE MESAJE (text afișat al acțiunilor)
+# ==========================================
+# Motorul emite doar coduri de acțiune (engine.ACTION_KEYS); textele se rezolvă
+# abia la randare / export, din catalogul limbii cerute. O limbă nouă = un dicționar
+# nou în MESSAGES cu aceleași chei, fără nicio modificare în engine.
+# cheie acțiune -> (text, reason, ref)
+
+DEFAULT_LANGUAGE = "ro"
+
+_STOP_SU = "OPRIȚI Sulfonilureea (SU)"
+_SU_INSULIN = (_STOP_SU, "La inițierea insulinei, SU crește mult riscul de hipoglicemie.",
+               "Consensus Report: Hypoglycemia risk / Place of Insulin")
+_SU_PRANDIAL = (_STOP_SU, "SU + insulină prandială crește mult riscul de hipoglicemie.",
+                "Consensus Report: Hypoglycemia risk")
+_DPP4 = ("OPRIȚI DPP-4i",
+         "Nu combinați DPP-4i cu GLP-1 RA sau GIP/GLP-1 RA (mecanisme similare, beneficiu mic).",
+         "Consensus Report: Principles of Care")
+
+MESSAGES = {
+    "ro": {
+        # PASUL 1: SIGURANȚĂ & SANITIZARE
+        "STOP_METFORMIN": ("OPRIȚI Metformin",
+            "Contraindicație: eGFR < 30 ml/min.",
+            "Consensus Report: Table 1"),
+        "ALERT_METFORMIN_DOSE": ("Reduceți doza Metformin",
+            "Considerați reducerea dozei la eGFR < 45.",
+            "Consensus Report: Other glucose-lowering medications"),
+        "ALERT_SGLT2I_LOW_EGFR": ("NU inițiați SGLT2i la eGFR < 20; dacă este deja în curs, continuați dacă este tolerat",
+            "La eGFR < 20 inițierea nu e recomandată. Dacă deja este inițiat, poate fi continuat pentru beneficiu cardiorenal, dacă este tolerat.",
+            "ADA-KDIGO 2022 / Consensus"),
+        "STOP_TZD": ("OPRIȚI TZD (Pioglitazona)",
+            "Risc de retenție lichidiană și agravare HF.",
+            "Consensus Report: Thiazolidinediones"),
+        "STOP_DPP4I_SAFETY": _DPP4,
+        "ALERT_SGLT2I_PAUSE": ("Luați în calcul PAUZĂ temporară SGLT2i",
+            "În boală acută sau suspiciune de ketoză, riscul de DKA e mai mare; reevaluați la stabilizare.",
+            "Consensus Report: Safety considerations"),
+        # PASUL 2: RED FLAGS
+        "START_BASAL_RED_FLAGS": ("INIȚIAȚI Insulină Bazală (prioritar)",
+            "Red flags (catabolism/ketoză/boală acută/suspiciune T1D) -> control rapid și sigur; nu așteptați escaladări lente.",
+            "Consensus Report: Place of Insulin"),
+        "STOP_SU_RED_FLAGS": _SU_INSULIN,
+        "START_RAPID_INTENSIFICATION": ("Considerați intensificare rapidă (± insulină prandială)",
+            "Hiperglicemie severă + red flags: poate necesita regim mai intensiv inițial.",
+            "Consensus Report: Severe hyperglycemia"),
+        # PASUL 3: PROTECȚIE DE ORGAN
+        "START_SGLT2I_HF": ("INIȚIAȚI SGLT2i (Dapa/Empa)",
+            "Beneficiu dovedit în reducerea HHF și mortalității CV în HF.",
+            "Consensus Rec: People with HF"),
+        "START_SGLT2I_CKD": ("INIȚIAȚI SGLT2i",
+            "Preferat pentru încetinirea progresiei CKD și reducerea HHF.",
+            "Consensus Rec: People with CKD"),
+        "START_GLP1_CKD": ("INIȚIAȚI GLP-1 RA",
+            "Alternativă când SGLT2i nu poate fi inițiat (eGFR < 20).",
+            "Consensus Rec: CKD alternative"),
+        "STOP_DPP4I_CKD": _DPP4,
+        "START_SGLT2I_ASCVD": ("INIȚIAȚI SGLT2i (pentru protecție CV la ASCVD)",
+            "În algoritmul strict 2022, beneficiul CV dovedit este pentru SGLT2i/GLP-1 RA. Evitați dublarea incretinică.",
+            "Consensus Rec: People with established CVD"),
+        "ALERT_SWITCH_GLP1_ASCVD": ("Luați în calcul trecerea la un GLP-1 RA cu beneficiu CV dovedit",
+            "Dacă SGLT2i nu poate fi inițiat, pentru ASCVD algoritmul 2022 favorizează GLP-1 RA cu beneficii CV dovedite.",
+            "Consensus Rec: People with established CVD"),
+        "START_CV_AGENT_ASCVD": ("INIȚIAȚI GLP-1 RA sau SGLT2i",
+            "ASCVD -> agent cu beneficiu CV dovedit, independent de HbA1c.",
+            "Consensus Rec: People with established CVD"),
+        "STOP_DPP4I_ASCVD": _DPP4,
+        # PASUL 4: INTENSIFICARE GLICEMICĂ & PONDERALĂ
+        "START_EARLY_COMBO": ("Considerați Terapie Combinată Precoce",
+            "La diagnostic recent și HbA1c mult peste țintă (≥1.5%), combinația inițială poate fi superioară.",
+            "Consensus Report: Early combination / VERIFY"),
+        "START_METFORMIN": ("ADĂUGAȚI Metformin",
+            "Eficacitate bună, cost redus, experiență vastă.",
+            "Consensus Report: Other medications"),
+        "START_INCRETIN_WEIGHT": ("ADĂUGAȚI GLP-1 RA sau GIP/GLP-1 RA",
+            "Obezitatea este țintă primară; agenții incretinici au eficacitate mare pe greutate și HbA1c.",
+            "Consensus Report: Weight management"),
+        "STOP_DPP4I_WEIGHT": _DPP4,
+        "SWITCH_DPP4I_GLP1": ("ÎNLOCUIȚI DPP-4i cu GLP-1 RA",
+            "DPP-4i are eficacitate modestă; GLP-1 RA are eficacitate mai mare și beneficii suplimentare.",
+            "Consensus Report: Comparative efficacy"),
+        "START_GLP1_BEFORE_INSULIN": ("INIȚIAȚI GLP-1 RA (înainte de Insulină)",
+            "Înaintea insulinei bazale: eficacitate bună, fără hipoglicemie, scădere ponderală.",
+            "Consensus Report: Place of Insulin"),
+        "STOP_DPP4I_GLP1": _DPP4,
+        "START_BASAL_SEVERE": ("INIȚIAȚI Insulină Bazală (+ considerați GLP-1 RA)",
+            "Hiperglicemie severă (HbA1c ≥10%) poate necesita insulină.",
+            "Consensus Report: Severe hyperglycemia / Place of Insulin"),
+        "STOP_SU_BASAL_SEVERE": _SU_INSULIN,
+        "START_BASAL": ("INIȚIAȚI Insulină Bazală",
+            "Persistă peste țintă pe terapie non-insulinică optimizată.",
+            "Consensus Report: Fig 5"),
+        "STOP_SU_BASAL": _SU_INSULIN,
+        "START_PRANDIAL": ("ADĂUGAȚI Insulină Prandială",
+            "Eșec pe insulină bazală (nevoie de intensificare).",
+            "Consensus Report: Insulin intensification"),
+        "STOP_SU_PRANDIAL": _SU_PRANDIAL,
+    },
+}
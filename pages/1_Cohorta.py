@@ -0,0 +1,112 @@
+import os
+import time
+from pathlib import Path
+
+import streamlit as st
+
+from cohort import CohortAggregate, read_chunks
+
+# ==========================================
+# ANALIZĂ DE COHORTĂ (CSV / Parquet mare)
+# ==========================================
+# Fișierul se citește pe blocuri (cohort.read_chunks), fiecare bloc e evaluat cu
+# motorul vectorizat și redus la contoare (CohortAggregate); graficele se
+# actualizează pe măsură ce sosesc rezultatele. Un fișier încărcat stă întreg în
+# memorie (st.file_uploader), deci încărcarea e limitată la MAX_UPLOAD_MB; pentru
+# cohorte mai mari: COHORT_DATA_DIR=<director> permite alegerea unui fișier CSV /
+# Parquet din acel director (doar din listă, fără căi introduse de utilizator), citit
+# de pe disc bloc cu bloc, deci în memorie stă un singur bloc. Nesetat = doar încărcare.
+st.set_page_config(page_title="Analiză de cohortă", page_icon="📊", layout="wide")
+
+REDRAW_SECONDS = 0.5
+MAX_UPLOAD_MB = 200
+DATA_DIR = os.environ.get("COHORT_DATA_DIR")
+TYPE_COLORS = {"STOP": "#d9534f", "START": "#28a745", "SWITCH": "#007bff", "ALERT": "#ffc107"}
+
+st.title("📊 Analiză de cohortă")
+st.caption("Coloane: hba1c, target, egfr, bmi; opțional flag-urile clinice și medicația "
+           "(coloana meds = „Metformin;SGLT2i” sau câte o coloană booleană per clasă).")
+
+
+def data_files(root):
+    """Fișierele CSV / Parquet din `root` (căi relative); legăturile care ies din director sunt ignorate."""
+    root = Path(root).resolve()
+    files = []
+    for path in root.rglob("*"):
+        if path.suffix.lower() in (".csv", ".parquet") and path.is_file() and path.resolve().is_relative_to(root):
+            files.append(str(path.relative_to(root)))
+    return sorted(files)
+
+
+source_kind = st.radio("Sursă", ["Încărcare fișier", "Fișier pe server"], horizontal=True) if DATA_DIR else None
+if source_kind != "Fișier pe server":
+    source = st.file_uploader("Cohortă CSV / Parquet", type=["csv", "parquet"], max_upload_size=MAX_UPLOAD_MB,
+                              help=f"Maxim {MAX_UPLOAD_MB} MB; fișierele mai mari se citesc de pe server (COHORT_DATA_DIR).")
+else:
+    choice = st.selectbox(f"Fișier din {DATA_DIR}", data_files(DATA_DIR), index=None)
+    source = str(Path(DATA_DIR).resolve() / choice) if choice else None
+chunk_size = st.select_slider("Pacienți per bloc", options=[10_000, 25_000, 50_000, 100_000, 200_000], value=50_000)
+
+
+def _bar(labels, values, title, colors=None, percent=False):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Bar(
+        x=list(values), y=list(labels), orientation="h", marker_color=colors,
+        text=[f"{v:.1f}%" if percent else f"{v:,}" for v in values], textposition="auto",
+    ))
+    fig.update_layout(title=title, height=320, margin={"l": 10, "r": 10, "t": 40, "b": 10},
+                      yaxis={"autorange": "reversed"}, xaxis={"range": [0, 100]} if percent else {})
+    return fig
+
+
+def draw(agg, slots, progress=None, elapsed=None):
+    types = agg.action_types()
+    starts = agg.start_counts()
+    shares = agg.shares()
+    status = f"{agg.patients:,} pacienți evaluați"
+    if agg.invalid:
+        status += f", {agg.invalid:,} rânduri sărite (valori numerice lipsă/invalide sau medicație necunoscută)"
+    if elapsed:
+        status += f" · {agg.patients / elapsed:,.0f} pacienți/s"
+    slots["status"].markdown(status)
+    slots["draws"] += 1  # chei unice: același grafic poate fi redesenat cu aceleași date
+    n = slots["draws"]
+    if progress is not None:
+        slots["progress"].progress(progress)
+    slots["types"].plotly_chart(
+        _bar(types, types.values(), "Acțiuni emise, pe tip", [TYPE_COLORS.get(t) for t in types]),
+        width="stretch", key=f"types-{n}")
+    slots["starts"].plotly_chart(
+        _bar(starts, starts.values(), "Inițieri (START) per clasă", "#28a745"), width="stretch", key=f"starts-{n}")
+    slots["shares"].plotly_chart(
+        _bar(["Red flags", "Cel puțin o acțiune STOP"], [shares["red_flags"], shares["stop"]],
+             "Pacienți (%)", ["#ffc107", "#d9534f"], percent=True), width="stretch", key=f"shares-{n}")
+
+
+def slots():
+    out = {"progress": st.progress(0.0), "status": st.empty(), "draws": 0}
+    left, middle, right = st.columns(3)
+    out["types"], out["starts"], out["shares"] = left.empty(), middle.empty(), right.empty()
+    return out
+
+
+if st.button("Analizează", type="primary", disabled=source is None):
+    agg = CohortAggregate()
+    placeholders = slots()
+    start = last_draw = time.perf_counter()
+    try:
+        for frame, progress in read_chunks(source, chunk_size):
+            agg.update(frame)
+            now = time.perf_counter()
+            if now - last_draw >= REDRAW_SECONDS:
+                draw(agg, placeholders, progress, now - start)
+                last_draw = now
+    except ValueError as exc:
+        st.error(f"Fișier invalid: {exc}")
+    else:
+        draw(agg, placeholders, 1.0, time.perf_counter() - start)
+        st.session_state["cohort_result"] = agg
+elif "cohort_result" in st.session_state:
+    st.caption("Rezultatul ultimei analize:")
+    draw(st.session_state["cohort_result"], slots(), 1.0)
@@ -0,0 +1,94 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# ==========================================
+# CACHE DE PLANURI (partajat între sesiuni)
+# ==========================================
+# LRU cu TTL și plafon de memorie. Cheia vine din engine.plan_key (medicație +
+# fapte), deci pacienții cu input-uri echivalente împart aceeași intrare.
+# Valorile sunt partajate: cei care le citesc nu trebuie să le modifice.
+
+
+def approx_size(value):
+    """Estimare (bytes) a memoriei ocupate de o valoare compusă din str/dict/list/tuple."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(approx_size(v) for v in value)
+    return size
+
+
+class PlanCache:
+    def __init__(self, max_bytes=64 * 2**20, max_entries=None, ttl=None, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        self.bytes = 0
+        self._entries = OrderedDict()  # cheie -> (valoare, mărime, expiră_la)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= self.clock():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = approx_size(value)
+        if size > self.max_bytes:
+            return value
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, expires)
+            self.bytes += size
+            while self.bytes > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
@@ -0,0 +1,92 @@
+from functools import lru_cache
+
+from engine import ACTION_RECORDS, DEFAULT_LANGUAGE
+
+# ==========================================
+# RANDARE HTML ÎNTR-UN SINGUR ELEMENT
+# ==========================================
+# Planul și panoul "Sumar Clinic & Fenotip" se trimit browserului ca un singur
+# st.markdown (un singur mesaj websocket), nu câte un element per acțiune.
+# Șabloanele sunt construite o dată per proces; cardurile pentru acțiunile din
+# catalog sunt deja randate la import. HTML-ul e compact (fără linii goale sau
+# indentare), ca markdown-ul să nu-l transforme în paragrafe / blocuri de cod.
+# Planul vine ca listă de coduri de acțiune (engine.plan_codes); textele se
+# rezolvă aici, din catalogul limbii cerute.
+
+# type -> (icon, clasă CSS); orice alt tip = alertă
+ACTION_STYLES = {
+    "STOP": ("⛔", "action-stop"),
+    "START": ("✅", "action-start"),
+    "SWITCH": ("🔄", "action-switch"),
+}
+_ALERT_STYLE = ("⚠️", "action-alert")
+
+_CARD = (
+    '<div class="{css}"><strong>{icon} {type}: {text}</strong><br>'
+    '<span style="font-size:0.95em">{reason}</span><br>'
+    '<div class="citation">Sursă: {ref}</div></div>'
+).format
+_NOTE = '<div class="note note-{kind}">{text}</div>'.format
+_METRIC = (
+    '<div class="metric-box"><div class="metric-label">Glicemie (HbA1c)</div>'
+    '<div class="metric-value">{hba1c}%</div>'
+    '<div class="metric-delta {direction}">{arrow} {delta:.1f}% vs Țintă</div></div>'
+).format
+_RESULTS = (
+    '<div class="results-grid">'
+    '<section><h2>📋 Plan de Acțiune Personalizat</h2>{plan}</section>'
+    '<aside><h3>Sumar Clinic &amp; Fenotip</h3>{summary}</aside>'
+    '</div>'
+).format
+
+_AT_TARGET = _NOTE(kind="success", text="✅ Pacientul este la țintă și pe medicație optimizată pentru protecția organelor.")
+_REFRACTORY = _NOTE(kind="warning", text="⚠️ Caz refractar. Opțiunile standard epuizate. Evaluare specialist pentru pompe/tehnologii avansate.")
+
+
+def _card(item):
+    icon, css = ACTION_STYLES.get(item["type"], _ALERT_STYLE)
+    return _CARD(css=css, icon=icon, **item)
+
+
+@lru_cache(maxsize=None)
+def _cards(lang):
+    """Cardurile tuturor acțiunilor din catalog (indexate după cod), randate o dată per limbă."""
+    return tuple(_card(record.as_dict(lang)) for record in ACTION_RECORDS)
+
+
+def render_plan(codes, above_target, lang=DEFAULT_LANGUAGE):
+    """Secțiunea de plan (cardurile sau mesajul pentru plan gol), din codurile acțiunilor."""
+    if not codes:
+        return _REFRACTORY if above_target else _AT_TARGET
+    cards = _cards(lang)
+    return "".join(cards[code] for code in codes)
+
+
+def render_summary(hba1c, target, hf, ckd, ascvd, age, bmi, red_flags):
+    delta = hba1c - target
+    parts = [
+        _METRIC(hba1c=hba1c, delta=delta, arrow="▲" if delta > 0 else "▼",
+                direction="worse" if delta > 0 else "better"),
+        "<p><strong>Status Organ:</strong></p>",
+    ]
+    if hf:
+        parts.append(_NOTE(kind="warning", text="Insuficiență Cardiacă (Prioritate SGLT2i)"))
+    elif ckd:
+        parts.append(_NOTE(kind="warning", text="Boală Renală (Prioritate SGLT2i)"))
+    elif ascvd:
+        parts.append(_NOTE(kind="warning", text="ASCVD (Prioritate GLP-1/SGLT2i)"))
+    else:
+        parts.append(_NOTE(kind="success", text="Fără boală cardiorenală stabilită"))
+
+    if age < 40:
+        parts.append(_NOTE(kind="info", text="ℹ️ Pacient Tânăr (&lt;40 ani): Risc crescut de complicații pe termen lung. Agresivitate terapeutică necesară."))
+    if bmi > 30:
+        parts.append(_NOTE(kind="info", text="ℹ️ Obezitate: Managementul greutății este țintă primară (Tirzepatide/Semaglutide)."))
+    if red_flags:
+        parts.append(_NOTE(kind="warning", text="⚠️ Red flags prezente: poate fi necesară insulină precoce și evaluare rapidă."))
+    return "".join(parts)
+
+
+def render_results(plan_html, summary_html):
+    """Tot conținutul de rezultate (plan + sumar), ca un singur payload HTML."""
+    return _RESULTS(plan=plan_html, summary=summary_html)
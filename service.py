@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import expand_plan, parse_patient, plan_codes, plan_key
+
+# ==========================================
+# SERVICIU HTTP/JSON ASYNC (integrare EHR)
+# ==========================================
+# python service.py --port 8080
+#   POST /plan   corp: un pacient (obiect JSON, ca o linie din cli.py) sau o listă
+#   GET  /health, GET /stats
+# Doar biblioteca standard (asyncio), HTTP/1.1 cu keep-alive.
+#
+# Cererile concurente sunt strânse într-o coadă și evaluate în micro-batch-uri
+# (cel mult --max-batch pacienți sau --max-wait ms de așteptare); în batch,
+# pacienții cu aceeași plan_key sunt evaluați o singură dată. Backpressure: coada e
+# limitată la --max-pending pacienți, peste limită se răspunde imediat 503 cu
+# Retry-After. Fiecare cerere are un termen (--timeout): 504 dacă planul nu e gata.
+# Cu --audit-log fiecare pacient evaluat (inclusiv duplicatele din batch) se adaugă în
+# jurnalul de audit (audit_log.py); bufferul se golește când coada rămâne goală.
+
+MAX_BODY = 1 << 20
+MAX_HEADER = 16 << 10
+READ_TIMEOUT = 10.0
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout",
+    411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def evaluate_batch(patients):
+    """Codurile planurilor unei liste de pacienți (argumente generate_plan); chei identice = un singur calcul."""
+    plans = {}
+    out = []
+    for patient in patients:
+        key = plan_key(**patient)
+        codes = plans.get(key)
+        if codes is None:
+            codes = plans[key] = plan_codes(**patient)
+        out.append(codes)
+    return out
+
+
+class PlanService:
+    def __init__(self, max_batch=64, max_wait=0.002, max_pending=2048, timeout=2.0, workers=0, audit=None):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ProcessPoolExecutor(max_workers=workers) if workers else None
+        self.audit = audit  # audit_log.AuditLog sau None
+        self._queue = None
+        self._batcher = None
+        self.counters = {"requests": 0, "patients": 0, "batches": 0, "rejected": 0, "timeouts": 0, "invalid": 0}
+
+    # ------------------------------
+    # micro-batching
+    # ------------------------------
+    async def submit(self, patients):
+        """Pune pacienții în coadă și așteaptă planurile; HTTPError 503 / 504 la suprasarcină / termen depășit."""
+        if self._queue.qsize() + len(patients) > self.max_pending:
+            self.counters["rejected"] += 1
+            raise HTTPError(503, "Serviciu supraîncărcat, reîncercați", {"Retry-After": "1"})
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in patients]
+        for item in zip(patients, futures):
+            self._queue.put_nowait(item)
+        try:
+            return await asyncio.wait_for(asyncio.gather(*futures), self.timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise HTTPError(504, f"Planul nu a fost generat în {self.timeout:g}s") from None
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if self._queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self._queue.get_nowait())
+
+            batch = [(patient, fut) for patient, fut in batch if not fut.done()]  # expirate între timp
+            if not batch:
+                continue
+            patients = [patient for patient, _ in batch]
+            try:
+                if self._executor is None:
+                    plans = evaluate_batch(patients)
+                else:
+                    plans = await loop.run_in_executor(self._executor, evaluate_batch, patients)
+                if self.audit is not None:
+                    for patient, codes in zip(patients, plans):
+                        self.audit.record(**patient, codes=codes)
+                    if self._queue.empty():
+                        self.audit.flush()
+            except Exception as exc:  # noqa: BLE001 - eroarea ajunge la fiecare cerere din batch
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                continue
+            self.counters["batches"] += 1
+            self.counters["patients"] += len(batch)
+            for (_, fut), codes in zip(batch, plans):
+                if not fut.done():
+                    fut.set_result(expand_plan(codes))
+
+    # ------------------------------
+    # HTTP
+    # ------------------------------
+    async def handle(self, method, path, body):
+        """(status, obiect JSON) pentru o cerere deja citită."""
+        if path == "/health":
+            return 200, {"status": "ok", "pending": self._queue.qsize()}
+        if path == "/stats":
+            stats = dict(self.counters, pending=self._queue.qsize())
+            stats["mean_batch"] = self.counters["patients"] / self.counters["batches"] if self.counters["batches"] else 0.0
+            return 200, stats
+        if path != "/plan":
+            raise HTTPError(404, f"Rută necunoscută: {path}")
+        if method != "POST":
+            raise HTTPError(405, "Folosiți POST", {"Allow": "POST"})
+
+        self.counters["requests"] += 1
+        try:
+            payload = json.loads(body)
+            records = payload if isinstance(payload, list) else [payload]
+            patients = [parse_patient(record) for record in records]
+        except ValueError as exc:  # include json.JSONDecodeError
+            self.counters["invalid"] += 1
+            raise HTTPError(400, str(exc)) from None
+        if not patients:
+            return 200, []
+        if len(patients) > self.max_pending:  # nu ar încăpea niciodată în coadă: 503 + Retry-After ar bucla clientul
+            self.counters["invalid"] += 1
+            raise HTTPError(413, f"Prea mulți pacienți într-o cerere ({len(patients)} > {self.max_pending}); "
+                                 "împărțiți lista")
+        plans = await self.submit(patients)
+
+        results = [
+            {"id": record["id"], "plan": plan} if "id" in record else {"plan": plan}
+            for record, plan in zip(records, plans)
+        ]
+        return 200, results if isinstance(payload, list) else results[0]
+
+    async def _read_request(self, reader):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), READ_TIMEOUT)
+        except asyncio.IncompleteReadError as exc:
+            if exc.partial:
+                raise HTTPError(400, "Cerere incompletă") from None
+            return None  # conexiune închisă între cereri
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Header-e prea mari") from None
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, version = lines[0].split(" ")
+        except ValueError:
+            raise HTTPError(400, "Linie de cerere invalidă") from None
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+        body = b""
+        if method == "POST":
+            if "transfer-encoding" in headers:
+                raise HTTPError(411, "Trimiteți Content-Length (fără chunked)")
+            try:
+                length = int(headers.get("content-length", ""))
+            except ValueError:
+                raise HTTPError(411, "Content-Length lipsă") from None
+            if length < 0:
+                raise HTTPError(400, "Content-Length invalid")
+            if length > MAX_BODY:
+                raise HTTPError(413, f"Corp mai mare de {MAX_BODY} octeți")
+            body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT)
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+        return method, path.split("?", 1)[0], body, keep_alive
+
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                keep_alive, extra = False, {}
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, body, keep_alive = request
+                    status, payload = await self.handle(method, path, body)
+                except HTTPError as exc:
+                    status, payload, extra = exc.status, {"error": str(exc)}, exc.headers
+                except asyncio.TimeoutError:
+                    status, payload = 408, {"error": "Timp de citire depășit"}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as exc:  # noqa: BLE001 - clientul primește 500, nu o conexiune închisă
+                    traceback.print_exc(file=sys.stderr)
+                    keep_alive, extra = False, {}
+                    status, payload = 500, {"error": f"Eroare internă ({type(exc).__name__})"}
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                head = [f"HTTP/1.1 {status} {_REASONS[status]}", "Content-Type: application/json; charset=utf-8",
+                        f"Content-Length: {len(data)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{name}: {value}" for name, value in extra.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8080):
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+        return await asyncio.start_server(self._connection, host, port, limit=MAX_HEADER)
+
+    async def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.audit is not None:
+            self.audit.close()
+
+
+async def serve(host, port, **options):
+    service = PlanService(**options)
+    server = await service.start(host, port)
+    print(f"Ascult pe http://{host}:{port} (POST /plan)", file=sys.stderr, flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ADA/EASD 2022 - serviciu HTTP/JSON pentru generate_plan")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch", type=int, default=64, help="pacienți per micro-batch")
+    parser.add_argument("--max-wait", type=float, default=2.0, help="ms de așteptare pentru completarea unui batch")
+    parser.add_argument("--max-pending", type=int, default=2048, help="pacienți în coadă peste care se răspunde 503")
+    parser.add_argument("--timeout", type=float, default=2.0, help="secunde per cerere până la 504")
+    parser.add_argument("--workers", type=int, default=0, help="procese pentru evaluare (0 = în bucla de evenimente)")
+    parser.add_argument("--audit-log", help="jurnal de audit (fișier sau director, vezi audit_log.py)")
+    args = parser.parse_args(argv)
+
+    audit = None
+    if args.audit_log:
+        import audit_log
+
+        audit = audit_log.open_log(args.audit_log)
+    started = time.monotonic()
+    try:
+        asyncio.run(serve(args.host, args.port, max_batch=max(1, args.max_batch), max_wait=args.max_wait / 1000,
+                          max_pending=args.max_pending, timeout=args.timeout, workers=args.workers, audit=audit))
+    except KeyboardInterrupt:
+        print(f"Oprit după {time.monotonic() - started:.0f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cohort import MEDS, _med_columns, evaluate_arrays, read_chunks, unknown_meds
+from engine import ACTION_KEYS, DRUG_CLASSES, PATIENT_FLAGS, PATIENT_NUMERICS
+
+# ==========================================
+# SIMULARE MONTE CARLO A TRAIECTORIILOR
+# ==========================================
+# generate_plan "simulează" deja un pas (simulated_meds). Aici repetăm pasul pe
+# mai multe vizite: se aplică planul (motorul vectorizat din cohort), HbA1c se
+# actualizează cu efectul claselor pornite / oprite (DRUG_CLASSES[..]["hba1c_effect"])
+# plus progresia bolii, apoi se reevaluează planul.
+#
+# Efectele din Table 1 sunt măsurate la HbA1c ~ EFFECT_REFERENCE; le aplicăm ca
+# fracție din excesul peste EFFECT_FLOOR, deci mai multe clase pornite în aceeași
+# vizită se compun multiplicativ (randament descrescător), nu se adună.
+#
+# Memoria e constantă: cohorta se procesează pe blocuri de --chunk-size pacienți,
+# iar din fiecare bloc se păstrează doar agregate (histograme per vizită), nu
+# traiectorii. Blocul i folosește SeedSequence(seed, spawn_key=(i,)), deci același
+# seed + același chunk_size dau același rezultat indiferent de numărul de workeri.
+# python simulate.py pacienti.csv --steps 8 --workers 0
+
+HBA1C_RANGE = (4.0, 20.0)
+HBA1C_BIN = 0.1
+_BINS = round((HBA1C_RANGE[1] - HBA1C_RANGE[0]) / HBA1C_BIN)
+_EFFECTS = np.array([DRUG_CLASSES[m]["hba1c_effect"] for m in MEDS])
+EFFECT_REFERENCE = 8.5
+EFFECT_FLOOR = 5.0
+_MAX_FRACTION = 0.9
+
+# situații acute: se consideră rezolvate după prima vizită
+TRANSIENT_FLAGS = ("newly_dx", "catabolic", "ketosis", "acute_illness")
+
+
+class SimulationResult:
+    """Agregatele simulării per vizită (vizita 0 = starea inițială)."""
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.patients = 0
+        self.invalid = 0  # rânduri sărite (valori numerice lipsă / invalide, medicație necunoscută)
+        self.hba1c_sum = np.zeros(steps + 1)
+        self.hba1c_hist = np.zeros((steps + 1, _BINS), dtype=np.int64)
+        self.at_target = np.zeros(steps + 1, dtype=np.int64)
+        self.on_med = np.zeros((steps + 1, len(MEDS)), dtype=np.int64)
+        self.actions = np.zeros((steps + 1, len(ACTION_KEYS)), dtype=np.int64)  # rândul 0 rămâne 0
+
+    def record(self, step, hba1c, target, m, hits=None):
+        bins = np.clip(((hba1c - HBA1C_RANGE[0]) / HBA1C_BIN).astype(np.int64), 0, _BINS - 1)
+        self.hba1c_hist[step] += np.bincount(bins, minlength=_BINS)
+        self.hba1c_sum[step] += hba1c.sum()
+        self.at_target[step] += np.count_nonzero(hba1c <= target)
+        self.on_med[step] += [np.count_nonzero(m[name]) for name in MEDS]
+        if hits is not None:
+            self.actions[step] += hits.sum(axis=0)
+
+    def merge(self, other):
+        self.patients += other.patients
+        self.invalid += other.invalid
+        for name in ("hba1c_sum", "hba1c_hist", "at_target", "on_med", "actions"):
+            getattr(self, name).__iadd__(getattr(other, name))
+        return self
+
+    def quantiles(self, qs=(0.1, 0.5, 0.9)):
+        """Cuantilele HbA1c per vizită, din histogramă (rezoluție HBA1C_BIN)."""
+        cum = np.cumsum(self.hba1c_hist, axis=1)
+        out = np.empty((self.steps + 1, len(qs)))
+        for j, q in enumerate(qs):
+            idx = (cum < q * max(self.patients, 1)).sum(axis=1)
+            out[:, j] = HBA1C_RANGE[0] + (np.minimum(idx, _BINS - 1) + 0.5) * HBA1C_BIN
+        return out
+
+    def summary(self):
+        """DataFrame cu o linie per vizită: HbA1c medie / p10 / p50 / p90, % la țintă, % per clasă."""
+        n = max(self.patients, 1)
+        frame = pd.DataFrame({"hba1c_mean": self.hba1c_sum / n}, index=pd.RangeIndex(self.steps + 1, name="visit"))
+        for q, col in zip((0.1, 0.5, 0.9), self.quantiles().T):
+            frame[f"hba1c_p{round(q * 100)}"] = col
+        frame["at_target_pct"] = 100 * self.at_target / n
+        for j, name in enumerate(MEDS):
+            frame[f"{name}_pct"] = 100 * self.on_med[:, j] / n
+        return frame
+
+    def action_counts(self):
+        """DataFrame vizite x acțiuni: de câte ori a apărut fiecare acțiune în planuri."""
+        return pd.DataFrame(self.actions[1:], index=pd.RangeIndex(1, self.steps + 1, name="visit"),
+                            columns=list(ACTION_KEYS))
+
+
+def _arrays(df):
+    """(numerics, flags, m) pentru rândurile valide + numărul de rânduri sărite (ca în CohortAggregate)."""
+    missing = [c for c in PATIENT_NUMERICS + PATIENT_FLAGS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Coloane lipsă: {', '.join(missing)}")
+    numerics = {c: df[c].to_numpy(dtype=float, copy=True) for c in PATIENT_NUMERICS}
+    valid = np.logical_and.reduce([np.isfinite(v) for v in numerics.values()]) & ~unknown_meds(df)
+    invalid = len(valid) - int(valid.sum())
+    if invalid:
+        df = df[valid]
+        numerics = {c: v[valid] for c, v in numerics.items()}
+    flags = {c: df[c].to_numpy(dtype=bool, copy=True) for c in PATIENT_FLAGS}
+    return (numerics, flags, _med_columns(df)), invalid
+
+
+def _draw_fractions(rng, n):
+    effects = rng.normal(_EFFECTS[:, 0], _EFFECTS[:, 1], (n, len(MEDS)))
+    return np.clip(effects / (EFFECT_REFERENCE - EFFECT_FLOOR), 0.0, _MAX_FRACTION)
+
+
+def simulate_chunk(numerics, flags, m, steps, seed, drift=0.1, drift_sd=0.2, egfr_drift=0.0):
+    """Simulează un bloc de pacienți (tablouri NumPy, modificate pe loc)."""
+    rng = np.random.default_rng(seed)
+    hba1c, target, egfr = numerics["hba1c"], numerics["target"], numerics["egfr"]
+    n = len(hba1c)
+    result = SimulationResult(steps)
+    result.patients = n
+
+    # fracția de reducere "creditată" fiecărei clase (pacient x clasă); medicația de
+    # la start e deja inclusă în HbA1c inițială, dar la oprire efectul ei se pierde
+    on = np.column_stack([m[name] for name in MEDS])
+    credited = np.where(on, _draw_fractions(rng, n), 0.0)
+    result.record(0, hba1c, target, m)
+
+    for step in range(1, steps + 1):
+        hits = evaluate_arrays(numerics, flags, m)
+        after = np.column_stack([m[name] for name in MEDS])
+        started, stopped = after & ~on, on & ~after
+        draws = _draw_fractions(rng, n)
+        ratio = np.prod(1 - draws * started, axis=1) / np.prod(1 - credited * stopped, axis=1)
+        hba1c -= np.maximum(hba1c - EFFECT_FLOOR, 0.0) * (1 - ratio)
+        credited = np.where(started, draws, np.where(stopped, 0.0, credited))
+        on = after
+
+        hba1c += rng.normal(drift, drift_sd, n)
+        np.clip(hba1c, *HBA1C_RANGE, out=hba1c)
+        if egfr_drift:
+            np.maximum(egfr + egfr_drift, 5.0, out=egfr)
+        for name in TRANSIENT_FLAGS:
+            flags[name][:] = False
+        result.record(step, hba1c, target, m, hits)
+    return result
+
+
+def _simulate_task(args):
+    ((numerics, flags, m), invalid), steps, seed, params = args
+    result = simulate_chunk(numerics, flags, m, steps, seed, **params)
+    result.invalid = invalid
+    return result
+
+
+def _chunks(cohort, chunk_size):
+    frames = [cohort] if isinstance(cohort, pd.DataFrame) else cohort
+    for frame in frames:
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size]
+
+
+def simulate(cohort, steps=4, seed=0, workers=1, chunk_size=50_000, **params):
+    """Simulează `steps` vizite pentru o cohortă.
+
+    cohort: DataFrame în formatul din cohort.evaluate_cohort sau un iterabil de
+    DataFrame-uri (ex. pd.read_csv(..., chunksize=...)), pentru cohorte care nu încap
+    în memorie. params: drift / drift_sd (progresia HbA1c per vizită), egfr_drift.
+    Întoarce un SimulationResult.
+    """
+    total = SimulationResult(steps)
+    tasks = (
+        (_arrays(frame), steps, np.random.SeedSequence(seed, spawn_key=(i,)), params)
+        for i, frame in enumerate(_chunks(cohort, chunk_size))
+    )
+    if workers <= 1:
+        for task in tasks:
+            total.merge(_simulate_task(task))
+        return total
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_simulate_task, task))
+            if len(pending) >= 2 * workers:
+                total.merge(pending.popleft().result())
+        while pending:
+            total.merge(pending.popleft().result())
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulare Monte Carlo a traiectoriilor de tratament (CSV/Parquet)")
+    parser.add_argument("input", help="cohortă CSV sau Parquet (coloanele din cohort.evaluate_cohort)")
+    parser.add_argument("--steps", type=int, default=4, help="numărul de vizite simulate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="procese paralele (0 = toate nucleele)")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="pacienți per bloc")
+    parser.add_argument("--drift", type=float, default=0.1, help="creșterea medie a HbA1c per vizită (%%)")
+    parser.add_argument("--egfr-drift", type=float, default=0.0, help="variația eGFR per vizită")
+    parser.add_argument("--actions", action="store_true", help="afișează și frecvența acțiunilor per vizită")
+    args = parser.parse_args(argv)
+
+    chunk_size = max(1, args.chunk_size)
+    frames = (frame for frame, _ in read_chunks(args.input, chunk_size))
+    result = simulate(frames, steps=args.steps, seed=args.seed, workers=args.workers or os.cpu_count() or 1,
+                      chunk_size=chunk_size, drift=args.drift, egfr_drift=args.egfr_drift)
+    print(f"{result.patients} pacienți, {args.steps} vizite")
+    if result.invalid:
+        print(f"{result.invalid} rânduri sărite (valori numerice lipsă/invalide sau medicație necunoscută)", file=sys.stderr)
+    print(result.summary().round(2).to_string())
+    if args.actions:
+        counts = result.action_counts()
+        print(counts.loc[:, counts.any()].to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
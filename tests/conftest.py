@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# modulele proiectului stau în rădăcina repo-ului (ca la benchmarks/run.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
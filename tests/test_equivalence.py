@@ -0,0 +1,69 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from engine import DRUG_CLASSES, PATIENT_FLAGS, generate_plan
+
+# ==========================================
+# ECHIVALENȚA MOTOARELOR
+# ==========================================
+# data/baseline_plans.json: planurile date de generate_plan din app.py-ul inițial
+# (if-chain-urile dinaintea motorului declarativ), pe valori alese la pragurile
+# din DRUG_CLASSES și din fapte. Motorul live, cel vectorizat și tabelul de decizie
+# trebuie să dea exact aceleași planuri.
+DATA = Path(__file__).parent / "data" / "baseline_plans.json"
+MEDS = tuple(DRUG_CLASSES)
+
+
+def _baseline():
+    data = json.loads(DATA.read_text(encoding="utf-8"))
+    fields, actions = data["fields"], data["actions"]
+    return [(dict(zip(fields, row[:-1])), [actions[i] for i in row[-1]]) for row in data["cases"]]
+
+
+BASELINE = _baseline()
+
+
+def random_patients(n, seed=0):
+    rng = random.Random(seed)
+    patients = []
+    for _ in range(n):
+        hba1c = round(rng.uniform(5, 14), 1)
+        patient = {
+            "meds": [m for m in MEDS if rng.random() < 0.3],
+            "hba1c": hba1c,
+            "target": rng.choice([6.5, 7.0, 7.5, 8.0]),
+            "egfr": rng.randint(5, 120),
+            "bmi": round(rng.uniform(18, 45), 1),
+            "age": rng.randint(18, 90),
+        }
+        for name in PATIENT_FLAGS:
+            patient[name] = rng.random() < 0.15
+        patients.append(patient)
+    return patients
+
+
+def test_generate_plan_matches_baseline():
+    mismatches = [patient for patient, plan in BASELINE if generate_plan(**patient) != plan]
+    assert not mismatches, f"{len(mismatches)} planuri diferite, ex.: {mismatches[0]}"
+
+
+def test_batch_matches_scalar():
+    pd = pytest.importorskip("pandas")
+    from cohort import generate_plan_batch
+
+    patients = [patient for patient, _ in BASELINE] + random_patients(5000)
+    batch = generate_plan_batch(pd.DataFrame(patients)).tolist()
+    mismatches = [p for p, plan in zip(patients, batch) if generate_plan(**p) != plan]
+    assert not mismatches, f"{len(mismatches)} planuri diferite, ex.: {mismatches[0]}"
+
+
+def test_decision_table_verify():
+    pytest.importorskip("pandas")
+    from decision_table import DecisionTable
+
+    table = DecisionTable.compile()
+    assert table.verify(samples=20_000) == []
+    assert all(table.generate_plan(**patient) == plan for patient, plan in BASELINE)
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from engine import plan_codes
+from test_equivalence import random_patients
+from visits import HistoryPlanner, IncrementalPlanner, codes_of, plan_diff
+
+# ==========================================
+# REEVALUAREA INCREMENTALĂ = REEVALUARE COMPLETĂ
+# ==========================================
+# ~6000 de vizite intercalate (600 de pacienți x 10 vizite, ordine amestecată în
+# fiecare rundă); între vizite se schimbă câteva câmpuri sau nimic, ca să fie
+# atinse și scurtăturile (plan moștenit, pași nerecalculați). Referința: plan_codes
+# pe fiecare vizită + plan_diff față de vizita anterioară a pacientului.
+PATIENTS = 600
+ROUNDS = 10
+CHUNK = 777
+
+
+def _visits(seed=0):
+    rng = random.Random(seed)
+    current = dict(enumerate(random_patients(PATIENTS, seed=seed)))
+    fresh = iter(random_patients(PATIENTS * ROUNDS, seed=seed + 1))
+    visits = []
+    for _ in range(ROUNDS):
+        order = list(current)
+        rng.shuffle(order)
+        for pid in order:
+            patient = dict(current[pid])
+            other = next(fresh)
+            for name in rng.sample(sorted(patient), rng.choice([0, 0, 1, 2, 3])):
+                patient[name] = other[name]
+            current[pid] = patient
+            visits.append((f"P{pid:04d}", patient))
+    return visits
+
+
+def _expected(visits):
+    last, out = {}, []
+    for pid, patient in visits:
+        codes = tuple(plan_codes(**patient))
+        out.append((codes, *plan_diff(last.get(pid, ()), codes)))
+        last[pid] = codes
+    return out
+
+
+VISITS = _visits()
+EXPECTED = _expected(VISITS)
+
+
+def test_incremental_planner_matches_plan_codes():
+    planner = IncrementalPlanner()
+    got = []
+    for pid, patient in VISITS:
+        delta = planner.evaluate(pid, **patient)
+        got.append((tuple(delta.codes), delta.added, delta.removed))
+    mismatches = [i for i, (a, b) in enumerate(zip(got, EXPECTED)) if a != b]
+    assert not mismatches, f"{len(mismatches)} vizite diferite, ex.: {VISITS[mismatches[0]]}"
+    assert len(planner) == PATIENTS
+
+
+def test_history_planner_matches_plan_codes():
+    pd = pytest.importorskip("pandas")
+
+    frame = pd.DataFrame([{"patient_id": pid, **patient} for pid, patient in VISITS])
+    planner = HistoryPlanner()
+    got = []
+    for start in range(0, len(frame), CHUNK):
+        result = planner.update(frame.iloc[start:start + CHUNK])
+        got += [tuple(codes_of(int(row[c])) for c in ("plan", "added", "removed"))
+                for row in result[["plan", "added", "removed"]].to_dict("records")]
+    mismatches = [i for i, (a, b) in enumerate(zip(got, EXPECTED)) if a != b]
+    assert len(got) == len(EXPECTED)
+    assert not mismatches, f"{len(mismatches)} vizite diferite, ex.: {VISITS[mismatches[0]]}"
+    assert planner.invalid == 0
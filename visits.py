@@ -0,0 +1,384 @@
+import argparse
+import json
+import sys
+import time
+from functools import lru_cache
+
+from engine import (
+    ACTION_KEYS, DEFAULT_LANGUAGE, FACT_BITS, FACT_DEPENDS, PATIENT_FLAGS, PATIENT_NUMERICS, RULES, STEPS, MedSet,
+    _apply, expand_plan, parse_patient, patient_facts,
+)
+
+# ==========================================
+# REEVALUARE INCREMENTALĂ PE ISTORICUL DE VIZITE
+# ==========================================
+# planner = IncrementalPlanner()
+# delta = planner.evaluate("P001", **vizita)      # argumentele generate_plan
+# delta.codes / delta.added / delta.removed       # planul și diferența față de vizita anterioară
+#
+# Planul = cei 4 pași (STEPS) aplicați în ordine; un pas citește doar medicația
+# simulată lăsată de pasul anterior și câteva fapte (gărzile when / unless ale
+# regulilor lui, inclusiv regulile "then"). STEP_FACTS / STEP_INPUTS spun care.
+# Per pacient se păstrează, pentru fiecare pas, (medicație la intrare, fapte citite,
+# coduri, medicație la ieșire); la vizita următoare un pas se recalculează doar dacă
+# i s-a schimbat una dintre acestea. Faptele se recalculează doar dacă s-a schimbat
+# vreun input numeric / flag. Rezultatul unui pas e memorat și global, per
+# (pas, medicație, fapte citite), ca rules_for.
+#
+# HistoryPlanner face același lucru vectorizat, pe blocuri de vizite (CSV / Parquet):
+# vizitele fără schimbări de medicație / fapte moștenesc planul vizitei anterioare,
+# iar pașii se evaluează o singură dată per cheie distinctă din bloc.
+#
+# python visits.py vizite.parquet -o diferente.jsonl --changes-only
+# Intrare JSONL (rând cu rând) sau CSV / Parquet (pe blocuri), cu câmpurile din cli.py
+# plus "patient_id" (obligatoriu) și opțional "date"; vizitele aceluiași pacient în
+# ordine cronologică (pacienții pot fi intercalați).
+
+
+def _rule_facts(rule):
+    mask = rule.when | rule.unless
+    for sub in rule.then:
+        mask |= _rule_facts(sub)
+    return mask
+
+
+def _step_facts(step):
+    mask = 0
+    for rule in RULES:
+        if rule.step == step:
+            mask |= _rule_facts(rule)
+    return mask
+
+
+assert [r.step for r in RULES] == sorted((r.step for r in RULES), key=STEPS.index), "RULES trebuie grupate pe pași"
+
+# pas -> faptele citite (bitmask) și câmpurile de input din care provin acestea
+STEP_FACTS = tuple(_step_facts(step) for step in STEPS)
+STEP_INPUTS = {
+    step: frozenset().union(*(FACT_DEPENDS[name] for name, bit in FACT_BITS.items() if mask & bit))
+    for step, mask in zip(STEPS, STEP_FACTS)
+}
+_STEP_RULES = tuple(tuple(r for r in RULES if r.step == step) for step in STEPS)
+_INDICES = range(len(STEPS))
+_NO_STEPS = (None,) * len(STEPS)
+
+
+def step_outcome(index, meds, facts):
+    """(coduri, medicația după pas) pentru pasul STEPS[index]; facts deja mascat cu STEP_FACTS[index]."""
+    rules = tuple(r for r in _STEP_RULES[index] if not (r.when & ~facts or r.unless & facts))
+    codes = []
+    meds = _apply(rules, meds, codes)
+    return tuple(codes), meds
+
+
+# pas -> {medicație << 32 | fapte citite: (coduri, medicația după pas, bitmask coduri)};
+# spațiu mic și finit, ca la rules_for
+_OUTCOMES = tuple({} for _ in STEPS)
+
+
+def _outcome(index, key):
+    codes, meds = step_outcome(index, key >> 32, key & 0xFFFFFFFF)
+    mask = 0
+    for code in codes:
+        mask |= 1 << code
+    outcome = _OUTCOMES[index][key] = (codes, meds, mask)
+    return outcome
+
+
+@lru_cache(maxsize=4096)
+def codes_of(mask):
+    """Bitmask de coduri -> tuplu de coduri, în ordinea catalogului (= ordinea din plan)."""
+    return tuple(code for code in range(len(ACTION_KEYS)) if mask >> code & 1)
+
+
+def plan_diff(before, after):
+    """(adăugate, scoase): codurile din `after` care lipsesc din `before` și invers, în ordinea catalogului."""
+    if before == after:
+        return (), ()
+    old, new = set(before), set(after)
+    return tuple(c for c in after if c not in old), tuple(c for c in before if c not in new)
+
+
+class PlanDelta:
+    """Planul unei vizite și diferența față de vizita anterioară a aceluiași pacient."""
+
+    __slots__ = ("codes", "added", "removed", "recomputed")
+
+    def __init__(self, codes, added, removed, recomputed):
+        self.codes = codes
+        self.added = added
+        self.removed = removed
+        self.recomputed = recomputed  # pașii recalculați (nume din STEPS)
+
+    @property
+    def changed(self):
+        return bool(self.added or self.removed)
+
+    def as_dict(self, lang=DEFAULT_LANGUAGE):
+        return {
+            "plan": [ACTION_KEYS[c] for c in self.codes],
+            "added": expand_plan(self.added, lang),
+            "removed": expand_plan(self.removed, lang),
+        }
+
+
+class IncrementalPlanner:
+    """Stare per pacient pentru evaluarea vizitelor succesive, una câte una."""
+
+    def __init__(self):
+        # patient_id -> (meds primite, bitmask meds, inputuri, fapte, cheile pașilor, rezultatele pașilor, coduri);
+        # cheia unui pas = medicație la intrare << 32 | fapte citite. Doar tupluri, ca să nu încarce GC-ul.
+        self._patients = {}
+        self.visits = 0
+        self.steps_recomputed = 0
+
+    def __len__(self):
+        return len(self._patients)
+
+    def evaluate(self, patient_id, meds, hba1c, target, egfr, bmi, ascvd, hf, ckd, age, newly_dx, catabolic,
+                 ketosis, acute_illness, suspected_t1d):
+        """Planul vizitei curente (același ca generate_plan) + diferența față de vizita precedentă."""
+        given = meds if isinstance(meds, int) else tuple(meds)
+        inputs = (hba1c, target, egfr, bmi, ascvd, hf, ckd, newly_dx, catabolic, ketosis, acute_illness,
+                  suspected_t1d)
+        self.visits += 1
+        state = self._patients.get(patient_id)
+        if state is None:
+            mask = given if isinstance(given, int) else MedSet.from_names(given)
+            facts = patient_facts(*inputs)
+            keys = outcomes = _NO_STEPS
+            before = ()
+        else:
+            previous, mask, old_inputs, old_facts, keys, outcomes, before = state
+            facts = old_facts if inputs == old_inputs else patient_facts(*inputs)
+            if given == previous:
+                if facts == old_facts:
+                    # nicio regulă nu vede diferența (ex. HbA1c variază fără să treacă un prag)
+                    if inputs is not old_inputs:
+                        self._patients[patient_id] = (given, mask, inputs, facts, keys, outcomes, before)
+                    return PlanDelta(before, (), (), ())
+            else:
+                mask = given if isinstance(given, int) else MedSet.from_names(given)
+
+        meds = mask
+        codes = ()
+        recomputed = ()
+        new_keys = ()
+        new_outcomes = ()
+        for index in _INDICES:
+            key = meds << 32 | facts & STEP_FACTS[index]
+            outcome = outcomes[index]
+            if key != keys[index]:
+                outcome = _OUTCOMES[index].get(key) or _outcome(index, key)
+                recomputed += (STEPS[index],)
+            new_keys += (key,)
+            new_outcomes += (outcome,)
+            step_codes, meds, _ = outcome
+            if step_codes:
+                codes += step_codes
+
+        self._patients[patient_id] = (given, mask, inputs, facts, new_keys, new_outcomes, codes)
+        self.steps_recomputed += len(recomputed)
+        return PlanDelta(codes, *plan_diff(before, codes), recomputed)
+
+    def forget(self, patient_id):
+        """Șterge starea unui pacient (ex. la sfârșitul istoricului lui)."""
+        self._patients.pop(patient_id, None)
+
+
+class HistoryPlanner:
+    """Varianta vectorizată, pe blocuri de vizite normalizate (vezi cohort.read_chunks).
+
+    Între blocuri se păstrează, per pacient, planul și cheile pașilor de la ultima
+    vizită, deci un istoric multi-anual se citește bucată cu bucată.
+    """
+
+    _UNKNOWN = 0xFFFFFFFFFFFFFFFF  # cheie de pas imposibilă: prima vizită a pacientului
+
+    def __init__(self):
+        self._last = {}  # patient_id -> (bitmask plan, cheile pașilor)
+        self.visits = 0
+        self.invalid = 0
+        self.changed = 0
+        self.steps_recomputed = 0
+
+    def __len__(self):
+        return len(self._last)
+
+    def update(self, frame):
+        """Planurile unui bloc de vizite.
+
+        Întoarce un DataFrame cu indexul blocului (fără rândurile cu valori numerice sau
+        patient_id lipsă ori cu medicație necunoscută): patient_id, plan / added / removed ca bitmask-uri de coduri
+        (vezi codes_of) și steps = câți pași s-au recalculat față de vizita anterioară.
+        """
+        import numpy as np
+        import pandas as pd
+
+        from cohort import MEDS, _med_columns, facts_array, unknown_meds
+
+        if "patient_id" not in frame.columns:
+            raise ValueError("Coloană lipsă: patient_id")
+        valid = (frame[list(PATIENT_NUMERICS)].notna().all(axis=1) & frame["patient_id"].notna()).to_numpy()
+        valid = valid & ~unknown_meds(frame)
+        self.invalid += int(np.count_nonzero(~valid))
+        frame = frame[valid]
+        n = len(frame)
+        ids, patients = pd.factorize(frame["patient_id"])
+        order = np.argsort(ids, kind="stable")  # vizitele fiecărui pacient consecutiv, în ordinea din bloc
+        ids = ids[order]
+        first = np.ones(n, dtype=bool)
+        first[1:] = ids[1:] != ids[:-1]
+        last = np.ones(n, dtype=bool)
+        last[:-1] = first[1:]
+
+        numerics = {c: frame[c].to_numpy(dtype=float)[order] for c in PATIENT_NUMERICS}
+        flags = {c: frame[c].to_numpy(dtype=bool)[order] for c in PATIENT_FLAGS}
+        columns = _med_columns(frame)
+        meds = np.zeros(n, dtype=np.uint64)
+        for bit, name in enumerate(MEDS):
+            meds |= columns[name][order].astype(np.uint64) << np.uint64(bit)
+        facts = facts_array(numerics, flags).astype(np.uint64)
+
+        # prin pași trec doar primul rând al fiecărui pacient și rândurile la care
+        # medicația sau faptele diferă de vizita anterioară; restul moștenesc
+        changed = first.copy()
+        changed[1:] |= (meds[1:] != meds[:-1]) | (facts[1:] != facts[:-1])
+        rows = np.flatnonzero(changed)
+        keys = np.empty((len(rows), len(STEPS)), dtype=np.uint64)
+        plan = np.zeros(len(rows), dtype=np.uint64)
+        step_meds = meds[rows]
+        for index, step_facts in enumerate(STEP_FACTS):
+            key = step_meds << np.uint64(32) | facts[rows] & np.uint64(step_facts)
+            keys[:, index] = key
+            unique, inverse = np.unique(key, return_inverse=True)
+            codes_out = np.empty(len(unique), dtype=np.uint64)
+            meds_out = np.empty(len(unique), dtype=np.uint64)
+            for j, k in enumerate(unique.tolist()):
+                _, meds_out[j], codes_out[j] = _OUTCOMES[index].get(k) or _outcome(index, k)
+            plan |= codes_out[inverse]
+            step_meds = meds_out[inverse]
+
+        source = np.cumsum(changed) - 1  # ultimul rând evaluat, la sau înaintea fiecărui rând
+        plan, keys = plan[source], keys[source]
+        before = np.empty(n, dtype=np.uint64)
+        before[1:] = plan[:-1]
+        before_keys = np.empty_like(keys)
+        before_keys[1:] = keys[:-1]
+        for i, patient_id in zip(np.flatnonzero(first).tolist(), patients[ids[first]]):
+            before[i], before_keys[i] = self._last.get(patient_id, (0, self._UNKNOWN))
+        for i, patient_id in zip(np.flatnonzero(last).tolist(), patients[ids[last]]):
+            self._last[patient_id] = (int(plan[i]), tuple(keys[i].tolist()))
+
+        steps = np.count_nonzero(keys != before_keys, axis=1)
+        added = plan & ~before
+        removed = before & ~plan
+        self.visits += n
+        self.changed += int(np.count_nonzero(added | removed))
+        self.steps_recomputed += int(steps.sum())
+
+        restore = np.empty(n, dtype=np.int64)
+        restore[order] = np.arange(n)
+        return pd.DataFrame({
+            "patient_id": frame["patient_id"].to_numpy(),
+            "plan": plan[restore], "added": added[restore], "removed": removed[restore], "steps": steps[restore],
+        }, index=frame.index)
+
+    def forget(self, patient_id):
+        """Șterge starea unui pacient (ex. la sfârșitul istoricului lui)."""
+        self._last.pop(patient_id, None)
+
+
+def _write(dst, patient_id, date, delta):
+    out = {"patient_id": patient_id}
+    if date is not None:
+        out["date"] = date
+    out.update(delta.as_dict())
+    dst.write(json.dumps(out, ensure_ascii=False, default=str) + "\n")
+
+
+def _run_stream(src, dst, changes_only):
+    """JSONL rând cu rând, cu IncrementalPlanner. Întoarce (planner, rânduri invalide)."""
+    from cli import read_records
+
+    planner = IncrementalPlanner()
+    errors = 0
+    for line_no, raw in read_records(src, "jsonl"):
+        try:
+            record = json.loads(raw)
+            patient = parse_patient(record)  # ValueError și pentru rânduri care nu sunt obiecte
+            patient_id = record.get("patient_id")
+            if patient_id in (None, ""):
+                raise ValueError("patient_id lipsă")
+            if not isinstance(patient_id, (str, int)) or isinstance(patient_id, bool):
+                raise ValueError(f"patient_id: se așteaptă text sau număr întreg, nu {patient_id!r}")
+            delta = planner.evaluate(patient_id, **patient)
+        except ValueError as exc:
+            errors += 1
+            dst.write(json.dumps({"line": line_no, "error": str(exc)}, ensure_ascii=False) + "\n")
+            continue
+        if delta.changed or not changes_only:
+            _write(dst, patient_id, record.get("date"), delta)
+    return planner, errors
+
+
+def _run_chunks(source, fmt, dst, changes_only, chunk_size):
+    """CSV / Parquet pe blocuri, cu HistoryPlanner. Întoarce (planner, rânduri invalide)."""
+    from cohort import read_chunks
+
+    planner = HistoryPlanner()
+    for frame, _ in read_chunks(source, chunk_size, fmt):
+        result = planner.update(frame)
+        if changes_only:
+            result = result[(result["added"] | result["removed"]) != 0]
+        dates = frame.loc[result.index, "date"].tolist() if "date" in frame.columns else [None] * len(result)
+        for patient_id, date, plan, added, removed in zip(
+            result["patient_id"].tolist(), dates, result["plan"].tolist(), result["added"].tolist(),
+            result["removed"].tolist(),
+        ):
+            _write(dst, patient_id, date, PlanDelta(codes_of(plan), codes_of(added), codes_of(removed), ()))
+    return planner, planner.invalid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Planuri incrementale pe istoricul de vizite (JSONL/CSV/Parquet -> JSONL)")
+    parser.add_argument("input", nargs="?", default="-", help="fișier JSONL/CSV/Parquet sau '-' (JSONL pe stdin)")
+    parser.add_argument("-o", "--output", default="-", help="fișier JSONL de ieșire sau '-' pentru stdout")
+    parser.add_argument("--format", choices=["jsonl", "csv", "parquet"], help="formatul intrării (implicit după extensie)")
+    parser.add_argument("--changes-only", action="store_true", help="scrie doar vizitele la care planul se schimbă")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="vizite per bloc (CSV / Parquet)")
+    args = parser.parse_args(argv)
+
+    name = args.input.lower()
+    fmt = args.format or ("parquet" if name.endswith(".parquet") else "csv" if name.endswith(".csv") else "jsonl")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        if fmt == "jsonl":
+            src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+            try:
+                planner, errors = _run_stream(src, dst, args.changes_only)
+            finally:
+                if src is not sys.stdin:
+                    src.close()
+        else:
+            planner, errors = _run_chunks(args.input, fmt, dst, args.changes_only, max(1, args.chunk_size))
+    except ValueError as exc:
+        print(f"Fișier invalid: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        if dst is not sys.stdout:
+            dst.close()
+
+    elapsed = time.perf_counter() - start
+    total_steps = planner.visits * len(STEPS)
+    print(f"{planner.visits} vizite, {len(planner)} pacienți, {planner.steps_recomputed}/{total_steps} pași "
+          f"recalculați, {planner.visits / elapsed if elapsed else 0:,.0f} vizite/s", file=sys.stderr)
+    if errors:
+        print(f"{errors} rânduri invalide", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import ast
+from functools import lru_cache
+
+from engine import ACTION_RECORDS, FACTS, plan_codes
+
+# ==========================================
+# WHAT-IF: LA CE VALORI SE SCHIMBĂ PLANUL?
+# ==========================================
+# Planul depinde de HbA1c / eGFR / BMI doar prin comparațiile din engine.FACTS, deci
+# e constant pe bucăți între pragurile acelor comparații. Pragurile se extrag direct
+# din expresiile faptelor (ast), iar planul se evaluează o singură dată per interval:
+# câteva zeci de apeluri generate_plan în loc de o grilă densă.
+
+VARIABLES = ("hba1c", "egfr", "bmi")
+DOMAINS = {"hba1c": (4.0, 18.0), "egfr": (5.0, 140.0), "bmi": (15.0, 60.0)}
+LABELS = {"hba1c": "HbA1c (%)", "egfr": "eGFR (mL/min)", "bmi": "BMI (kg/m²)"}
+
+# operatorul comparației -> pragul aparține intervalului de sus (x >= c) sau de jos (x <= c)
+_UPPER_CLOSED = {ast.Lt: True, ast.GtE: True, ast.Gt: False, ast.LtE: False}
+
+
+@lru_cache(maxsize=None)
+def thresholds():
+    """{variabilă: {(prag, aparține_sus)}}; "gap" = HbA1c - țintă."""
+    found = {}
+    for expr in FACTS.values():
+        for node in ast.walk(ast.parse(expr, mode="eval")):
+            if not isinstance(node, ast.Compare) or len(node.ops) != 1:
+                continue
+            left, right = node.left, node.comparators[0]
+            if not isinstance(right, ast.Constant):
+                continue
+            if isinstance(left, ast.Name):
+                name = left.id
+            elif (isinstance(left, ast.BinOp) and isinstance(left.op, ast.Sub)
+                  and getattr(left.left, "id", None) == "hba1c" and getattr(left.right, "id", None) == "target"):
+                name = "gap"
+            else:
+                continue
+            found.setdefault(name, set()).add((float(right.value), _UPPER_CLOSED[type(node.ops[0])]))
+    return found
+
+
+def cut_points(var, patient):
+    """Pragurile (valoare, aparține_sus) ale variabilei pentru acest pacient, sortate."""
+    cuts = set(thresholds().get(var, ()))
+    if var == "hba1c":
+        cuts |= {(patient["target"] + gap, upper) for gap, upper in thresholds().get("gap", ())}
+    lo, hi = DOMAINS[var]
+    return sorted(c for c in cuts if lo < c[0] < hi)
+
+
+def _plan_at(patient, **changes):
+    return plan_codes(**dict(patient, **changes))
+
+
+def _describe(codes):
+    return tuple(f"{ACTION_RECORDS[code].type}: {ACTION_RECORDS[code].message()[0]}" for code in codes)
+
+
+def _sample_points(var, patient):
+    lo, hi = DOMAINS[var]
+    values = [lo] + [c for c, _ in cut_points(var, patient)] + [hi]
+    points = []
+    for a, b in zip(values, values[1:]):
+        points += [a, (a + b) / 2]
+    return points + [hi]
+
+
+def sweep(patient, var):
+    """Punctele unde se schimbă planul când variază doar `var`.
+
+    Întoarce o listă de dict-uri {at, inclusive, added, removed}: la valoarea `at`
+    (inclusiv dacă inclusive=True, altfel strict peste) planul capătă acțiunile `added`
+    și le pierde pe `removed`.
+    """
+    cuts = dict(cut_points(var, patient))
+    changes = []
+    prev_x, prev = None, None
+    for x in _sample_points(var, patient):
+        current = _describe(_plan_at(patient, **{var: x}))
+        if prev is not None and current != prev:
+            if x in cuts:
+                at, inclusive = x, True
+            else:
+                at, inclusive = prev_x, False
+            changes.append({
+                "at": at,
+                "inclusive": inclusive,
+                "added": [a for a in current if a not in prev],
+                "removed": [a for a in prev if a not in current],
+            })
+        prev_x, prev = x, current
+    return changes
+
+
+def plan_regions(patient, x_var="hba1c", y_var="egfr"):
+    """Harta regiunilor de plan pe două variabile.
+
+    Întoarce (x_edges, y_edges, z, plans): z[j][i] = indexul planului (în `plans`)
+    în celula [x_edges[i], x_edges[i+1]] x [y_edges[j], y_edges[j+1]].
+    """
+    def edges(var):
+        lo, hi = DOMAINS[var]
+        return [lo] + [c for c, _ in cut_points(var, patient)] + [hi]
+
+    x_edges, y_edges = edges(x_var), edges(y_var)
+    plans, index, z = [], {}, []
+    for y0, y1 in zip(y_edges, y_edges[1:]):
+        row = []
+        for x0, x1 in zip(x_edges, x_edges[1:]):
+            plan = _describe(_plan_at(patient, **{x_var: (x0 + x1) / 2, y_var: (y0 + y1) / 2}))
+            if plan not in index:
+                index[plan] = len(plans)
+                plans.append(plan)
+            row.append(index[plan])
+        z.append(row)
+    return x_edges, y_edges, z, plans
+
+
+def plan_map_figure(patient, x_var="hba1c", y_var="egfr"):
+    """Heatmap plotly cu regiunile de plan și pacientul curent marcat."""
+    import plotly.graph_objects as go
+
+    x_edges, y_edges, z, plans = plan_regions(patient, x_var, y_var)
+    hover = [["<br>".join(plans[k]) or "Fără acțiuni" for k in row] for row in z]
+    n = max(len(plans) - 1, 1)
+    fig = go.Figure(go.Heatmap(
+        x=x_edges, y=y_edges, z=z, text=hover, zmin=0, zmax=n,
+        hovertemplate=f"{LABELS[x_var]}: %{{x}}<br>{LABELS[y_var]}: %{{y}}<br>Regiune %{{z}}<br>%{{text}}<extra></extra>",
+        colorscale="Turbo", showscale=False, xgap=1, ygap=1,
+    ))
+    fig.add_scatter(
+        x=[patient[x_var]], y=[patient[y_var]], mode="markers", name="Pacient",
+        marker={"symbol": "x", "size": 14, "color": "black"}, hoverinfo="skip",
+    )
+    fig.update_layout(
+        xaxis_title=LABELS[x_var], yaxis_title=LABELS[y_var], showlegend=False,
+        margin={"l": 10, "r": 10, "t": 30, "b": 10}, height=420,
+        title=f"{len(plans)} regiuni de plan distincte",
+    )
+    return fig